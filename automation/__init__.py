@@ -6,20 +6,31 @@ AI Tool Search Automation Package
 - download: 檔案下載
 - upload: SharePoint 上傳
 - notification: Teams 通知
+- pipeline: 下載 / 轉換 / 上傳管線
+- archive: 每日合併與 Parquet 封存
 - utils: 工具函數
 """
 
 # Browser 模組
 from .browser.browser_chrome import BrowserManager, set_global_browser, close_global_browser
 from .browser.login import login
+from .browser.browser_pool import BrowserPool, HttpExportPool
 
 # Download 模組
 from .download.download_excel import download_excel
 from .download.rename_query_file import rename_query_file
+from .download.http_export import download_excel_http
 
 # Upload 模組
 from .upload.upload_sharepoint import upload_temp_files_to_sharepoint
 
+# Pipeline 模組
+from .pipeline.slot_pipeline import SlotPipeline
+
+# Archive 模組
+from .archive.parquet_archive import archive_day
+from .archive.daily_merge import merge_day
+
 # Notification 模組
 from .notification.notify_teams_result import report_download_status
 
@@ -37,14 +48,24 @@ __all__ = [
     "set_global_browser", 
     "close_global_browser",
     "login",
+    "BrowserPool",
+    "HttpExportPool",
     
     # Download
     "download_excel",
     "rename_query_file",
+    "download_excel_http",
     
     # Upload
     "upload_temp_files_to_sharepoint",
     
+    # Pipeline
+    "SlotPipeline",
+    
+    # Archive
+    "archive_day",
+    "merge_day",
+    
     # Notification
     "report_download_status",
     
@@ -0,0 +1,13 @@
+"""
+Archive 模組 - 每日合併與 Parquet 封存
+"""
+
+from .parquet_archive import archive_day, archive_path
+from .daily_merge import merge_day, daily_file_path
+
+__all__ = [
+    "archive_day",
+    "archive_path",
+    "merge_day",
+    "daily_file_path"
+]
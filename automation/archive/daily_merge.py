@@ -0,0 +1,93 @@
+"""
+每日合併 - 將同一天所有時段的 CSV 依 Time 做 k-way merge，去除完全相同的重複列後輸出單一檔案
+
+時段邊界（hh:mm:00 ~ hh:mm+9:59）與重新匯出都可能讓同一筆事件出現在兩個時段檔；
+合併時每個時段檔先成為依 (Time, 其餘欄位) 排序的 run，重複列在合併結果中必定相鄰，只需與前一列比較
+"""
+
+import csv
+import heapq
+import logging
+import os
+import tempfile
+import config
+from ..download.rename_query_file import OUTPUT_COLUMNS
+from .parquet_archive import slot_csv_files
+
+
+def daily_file_path(date):
+    """指定日期（YYYYMMDD）的合併檔路徑"""
+    return os.path.join(config.DAILY_FOLDER, f"logger_urlLog_{date}.csv")
+
+
+def _read_rows(path):
+    """串流讀取時段 CSV 的資料列（略過標題列），每列為 tuple"""
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            yield tuple(row)
+
+
+def _sorted_run(path, run_dir):
+    """
+    確保時段檔依 (Time, 其餘欄位) 排序
+
+    逐列與前一列比較檢查是否已排序（不載入整個檔案），已排序的檔案直接使用；
+    發現順序不符時才在記憶體中排序（最多一個時段的資料）後寫到 run_dir 的暫存檔
+    """
+    previous = None
+    for row in _read_rows(path):
+        if previous is not None and row < previous:
+            break
+        previous = row
+    else:
+        return path
+
+    rows = sorted(_read_rows(path))
+    run_path = os.path.join(run_dir, os.path.basename(path))
+    with open(run_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(OUTPUT_COLUMNS.keys())
+        writer.writerows(rows)
+    return run_path
+
+
+def merge_day(date, files=None, logger=None):
+    """
+    將指定日期的時段 CSV 合併成依 Time 排序且無重複列的單一 CSV（格式與時段檔相同）
+
+    合併時同時只保留每個時段檔的一列，記憶體用量與當天資料量無關；先寫入 .part 再改名
+
+    Returns:
+        str | None: 合併檔路徑，沒有時段檔時回傳 None
+    """
+    logger = logger or logging.getLogger(__name__)
+    files = files if files is not None else slot_csv_files(date)
+    if not files:
+        logger.warning(f"⚠️ 找不到 {date} 的 CSV，略過每日合併")
+        return None
+
+    output_path = daily_file_path(date)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    part_path = output_path + ".part"
+
+    written = duplicates = 0
+    with tempfile.TemporaryDirectory(prefix="merge_", dir=config.DOWNLOAD_FOLDER) as run_dir:
+        runs = [_sorted_run(path, run_dir) for path in files]
+        with open(part_path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(OUTPUT_COLUMNS.keys())
+            previous = None
+            for row in heapq.merge(*(_read_rows(path) for path in runs)):
+                if row == previous:
+                    duplicates += 1
+                    continue
+                writer.writerow(row)
+                previous = row
+                written += 1
+    os.replace(part_path, output_path)
+
+    logger.info(f"🧩 每日合併完成：{os.path.basename(output_path)}"
+                f"（{len(files)} 個時段，{written} 筆，移除重複 {duplicates} 筆）")
+    return output_path
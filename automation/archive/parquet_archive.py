@@ -0,0 +1,126 @@
+"""
+Parquet 每日封存 - 將當天所有時段的 CSV 寫成一個壓縮的 Parquet 檔，依日期分區
+
+輸出路徑為 <ARCHIVE_FOLDER>/date=YYYY-MM-DD/logger_urlLog_<date>.parquet，
+可直接以 pyarrow.dataset / pandas / DuckDB 讀取整個資料夾並依日期、欄位篩選
+"""
+
+import glob
+import logging
+import os
+from datetime import datetime
+import config
+from ..download.rename_query_file import OUTPUT_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # 未安裝 pyarrow 時無法封存，CSV 輸出不受影響
+    pa = None
+
+# 以字典編碼儲存的類別欄位
+CATEGORY_COLUMNS = ("User Group", "Action")
+
+
+def archive_schema():
+    """封存檔的欄位型別：Time 為時間戳記、類別欄位為字典編碼，其餘為字串"""
+    fields = []
+    for name in OUTPUT_COLUMNS:
+        if name == "Time":
+            fields.append(pa.field(name, pa.timestamp("s")))
+        elif name in CATEGORY_COLUMNS:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def _read_csv_batches(path, schema, invalid_times):
+    """
+    串流讀取 CSV，逐批轉成封存檔的欄位型別
+
+    不符合 config.ARCHIVE_TIME_FORMAT 的非空白 Time 會寫成 null，
+    筆數累加到 invalid_times["count"]，第一個值記在 invalid_times["sample"]
+    """
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=config.ARCHIVE_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in OUTPUT_COLUMNS}),
+    )
+    for batch in reader:
+        columns = []
+        for field in schema:
+            column = batch.column(field.name)
+            if field.name == "Time":
+                parsed = pc.strptime(column, format=config.ARCHIVE_TIME_FORMAT, unit="s", error_is_null=True)
+                invalid = pc.and_(pc.is_null(parsed), pc.not_equal(column, ""))
+                count = pc.sum(invalid).as_py() or 0
+                if count:
+                    invalid_times["count"] += count
+                    invalid_times.setdefault("sample", column.filter(invalid)[0].as_py())
+                column = parsed
+            elif field.name in CATEGORY_COLUMNS:
+                column = column.dictionary_encode()
+            columns.append(column)
+        yield pa.Table.from_arrays(columns, schema=schema)
+
+
+def archive_path(date):
+    """指定日期（YYYYMMDD）的封存檔路徑"""
+    day = datetime.strptime(date, "%Y%m%d").strftime("%Y-%m-%d")
+    return os.path.join(config.ARCHIVE_FOLDER, f"date={day}", f"logger_urlLog_{date}.parquet")
+
+
+def slot_csv_files(date, folder=None):
+    """指定日期所有時段的 CSV，依時段排序"""
+    folder = folder or config.DOWNLOAD_FOLDER
+    return sorted(glob.glob(os.path.join(folder, f"logger_urlLog_{date}_*.csv")))
+
+
+def archive_day(date, files=None, logger=None):
+    """
+    將指定日期的 CSV 寫成 Parquet 封存檔
+
+    未指定 files 時，啟用每日合併則使用合併檔（已排序、去除重複），否則使用所有時段 CSV；
+    以串流方式分批寫入同一個 Parquet 檔，記憶體用量與當天資料量無關；
+    先寫入 .part 再改名，重新執行時會覆蓋當天的封存檔
+
+    Returns:
+        str | None: 封存檔路徑，沒有資料或未安裝 pyarrow 時回傳 None
+    """
+    logger = logger or logging.getLogger(__name__)
+    if pa is None:
+        logger.warning("⚠️ 未安裝 pyarrow，略過 Parquet 封存")
+        return None
+
+    if files is None:
+        daily_file = os.path.join(config.DAILY_FOLDER, f"logger_urlLog_{date}.csv")
+        use_daily = config.DAILY_MERGE_ENABLED and os.path.exists(daily_file)
+        files = [daily_file] if use_daily else slot_csv_files(date)
+    if not files:
+        logger.warning(f"⚠️ 找不到 {date} 的 CSV，略過 Parquet 封存")
+        return None
+
+    schema = archive_schema()
+    output_path = archive_path(date)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    part_path = output_path + ".part"
+
+    rows = 0
+    invalid_times = {"count": 0}
+    with pq.ParquetWriter(part_path, schema, compression=config.ARCHIVE_COMPRESSION) as writer:
+        for path in files:
+            for table in _read_csv_batches(path, schema, invalid_times):
+                writer.write_table(table)
+                rows += table.num_rows
+    os.replace(part_path, output_path)
+
+    if invalid_times["count"]:
+        logger.warning(f"⚠️ {invalid_times['count']} 筆 Time 不符合格式 {config.ARCHIVE_TIME_FORMAT}，"
+                       f"封存為空值（例如：{invalid_times['sample']!r}）")
+
+    logger.info(f"🗄 Parquet 封存完成：{os.path.relpath(output_path, config.BASE_DIR)}"
+                f"（{len(files)} 個檔案，{rows} 筆，{os.path.getsize(output_path)} bytes）")
+    return output_path
@@ -4,10 +4,22 @@ Browser 模組 - 瀏覽器管理和登入功能
 
 from .browser_chrome import BrowserManager, set_global_browser, close_global_browser
 from .login import login
+from .browser_pool import BrowserPool, BrowserWorker, HttpExportPool, start_browser
+from .resource_blocker import ResourceBlocker, attach_resource_blocker, get_resource_blocker
+from .session_store import SessionStore, restore_or_login
 
 __all__ = [
     "BrowserManager",
     "set_global_browser",
     "close_global_browser", 
-    "login"
+    "login",
+    "BrowserPool",
+    "BrowserWorker",
+    "HttpExportPool",
+    "start_browser",
+    "ResourceBlocker",
+    "attach_resource_blocker",
+    "get_resource_blocker",
+    "SessionStore",
+    "restore_or_login"
 ] 
\ No newline at end of file
@@ -1,23 +1,107 @@
 from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
+from ..download.download_tracker import attach_download_tracker
+from .resource_blocker import attach_resource_blocker
+from utils.metrics import metrics
 import config
 import os
+import shutil
+import tempfile
+import threading
 
 # 全域瀏覽器實例
 _global_browser = None
 
+# 已解析的 chromedriver 路徑（同一行程內的所有瀏覽器共用）
+_driver_path = None
+_driver_lock = threading.Lock()
+
+# 複製設定檔時略過的鎖定檔、快取與登入狀態
+# 範本取自已登入入口網站的設定檔，cookies 與 storage 不可以明文留在範本中（登入 session 只由 session_store 加密保存）
+PROFILE_IGNORE = shutil.ignore_patterns(
+    "Singleton*", "lockfile", "DevToolsActivePort", "Crashpad",
+    "Cache", "Code Cache", "GPUCache", "ShaderCache", "GrShaderCache", "Service Worker",
+    "Cookies*", "Network", "Local Storage", "Session Storage", "Sessions", "IndexedDB",
+    "Login Data*", "Web Data*"
+)
+
+
+def resolve_driver_path(refresh=False):
+    """
+    取得 chromedriver 路徑：config.CHROMEDRIVER_PATH → 行程內快取 → 快取檔 → webdriver-manager
+
+    webdriver-manager 的 install() 每次都會檢查版本（可能需要連線下載），取得後寫入
+    config.CHROMEDRIVER_CACHE_FILE，之後的啟動與重啟直接使用；refresh=True 時重新向 webdriver-manager 取得
+    """
+    global _driver_path
+    if config.CHROMEDRIVER_PATH:
+        return config.CHROMEDRIVER_PATH
+
+    with _driver_lock:
+        if refresh:
+            _driver_path = None
+        elif _driver_path is None and os.path.exists(config.CHROMEDRIVER_CACHE_FILE):
+            with open(config.CHROMEDRIVER_CACHE_FILE, "r", encoding="utf-8") as f:
+                cached = f.read().strip()
+            if cached and os.path.exists(cached):
+                _driver_path = cached
+
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+            os.makedirs(os.path.dirname(config.CHROMEDRIVER_CACHE_FILE), exist_ok=True)
+            tmp_path = config.CHROMEDRIVER_CACHE_FILE + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(_driver_path)
+            os.replace(tmp_path, config.CHROMEDRIVER_CACHE_FILE)
+        return _driver_path
+
+
+def prepare_profile():
+    """建立本次使用的暫存設定檔：有範本時複製範本（略過 Chrome 首次啟動的初始化），否則為空資料夾"""
+    profile_dir = tempfile.mkdtemp(prefix="rpa-chrome-")
+    template = config.BROWSER_PROFILE_TEMPLATE
+    if template and os.path.isdir(template):
+        try:
+            shutil.copytree(template, profile_dir, ignore=PROFILE_IGNORE, dirs_exist_ok=True)
+        except (OSError, shutil.Error) as e:
+            print(f"⚠️ 複製瀏覽器設定檔範本失敗，改用空白設定檔: {e}")
+    return profile_dir
+
+
+def save_profile_template(profile_dir):
+    """尚無範本時，將已正常關閉的設定檔（略過鎖定檔與快取）保存為範本，先複製到暫存資料夾再改名"""
+    template = config.BROWSER_PROFILE_TEMPLATE
+    if not template or os.path.isdir(template) or not os.path.isdir(profile_dir):
+        return
+    tmp_dir = f"{template}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        shutil.copytree(profile_dir, tmp_dir, ignore=PROFILE_IGNORE)
+        os.replace(tmp_dir, template)
+        print(f"✓ 已保存瀏覽器設定檔範本：{template}")
+    except (OSError, shutil.Error):
+        # 其他瀏覽器已先保存範本，或複製失敗（下次啟動再試）
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
 class BrowserManager:
-    def __init__(self, headless=None, rpa_mode=True):
+    def __init__(self, headless=None, rpa_mode=True, download_folder=None):
         self.driver = None
         self.headless = headless if headless is not None else config.BROWSER_HEADLESS
         self.rpa_mode = rpa_mode  # 新增 RPA 模式參數
+        self.download_folder = download_folder  # RPA 模式下的下載資料夾，None 則使用 config 設定
+        self.profile_dir = None  # RPA 模式的暫存設定檔，關閉瀏覽器時刪除
         
     def setup_driver(self):
+        """啟動 Chrome，啟動耗時記入執行指標 rpa_phase_seconds{phase="browser_start"}"""
+        with metrics.phase("browser_start"):
+            return self._setup_driver()
+
+    def _setup_driver(self):
         try:
             # Chrome 選項設定
             chrome_options = Options()
@@ -34,14 +118,25 @@ class BrowserManager:
             chrome_options.add_argument("--disable-blink-features=AutomationControlled")
             chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
             chrome_options.add_experimental_option('useAutomationExtension', False)
+            chrome_options.add_argument("--no-first-run")
+            chrome_options.add_argument("--no-default-browser-check")
+
+            # 精簡設定：不需要的擴充功能、背景服務與圖片都不載入
+            if config.BROWSER_DISABLE_EXTENSIONS:
+                chrome_options.add_argument("--disable-extensions")
+                chrome_options.add_argument("--disable-component-extensions-with-background-pages")
+                chrome_options.add_argument("--disable-background-networking")
+                chrome_options.add_argument("--disable-sync")
+            if config.BROWSER_DISABLE_IMAGES:
+                chrome_options.add_argument("--blink-settings=imagesEnabled=false")
             
             # 根據 RPA 模式決定用戶資料目錄和下載資料夾
             if self.rpa_mode:
-                # RPA 模式：使用臨時用戶資料目錄和下載到 temp
-                import tempfile
-                temp_dir = tempfile.mkdtemp()
-                chrome_options.add_argument(f"--user-data-dir={temp_dir}")
-                download_folder = config.DOWNLOAD_FOLDER
+                # RPA 模式：複製設定檔範本作為臨時用戶資料目錄，下載到 temp
+                self.profile_dir = prepare_profile()
+                chrome_options.add_argument(f"--user-data-dir={self.profile_dir}")
+                download_folder = self.download_folder or config.DOWNLOAD_FOLDER
+                os.makedirs(download_folder, exist_ok=True)
                 print(f"RPA 模式：使用臨時用戶資料目錄，下載到 {download_folder}")
             else:
                 # 一般模式：使用預設用戶資料目錄和下載到 Downloads
@@ -56,30 +151,71 @@ class BrowserManager:
                 "download.directory_upgrade": True,
                 "safebrowsing.enabled": True
             }
+            if config.BROWSER_DISABLE_IMAGES:
+                prefs["profile.managed_default_content_settings.images"] = 2
             chrome_options.add_experimental_option("prefs", prefs)
+
+            # 開啟 performance log 以接收 DevTools 事件（下載追蹤使用）
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
             
-            # 設定 WebDriver
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
+            # 設定 WebDriver（chromedriver 路徑解析一次後快取）
+            with metrics.phase("driver_resolve"):
+                driver_path = resolve_driver_path()
+            try:
+                self.driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+            except SessionNotCreatedException:
+                if config.CHROMEDRIVER_PATH:
+                    raise
+                # 快取的 chromedriver 與更新後的 Chrome 版本不符，重新取得後再試一次
+                print("⚠️ chromedriver 與 Chrome 版本不符，重新取得 chromedriver")
+                self.driver = webdriver.Chrome(service=Service(resolve_driver_path(refresh=True)),
+                                               options=chrome_options)
             
-            # 設定等待時間
-            self.driver.implicitly_wait(config.BROWSER_TIMEOUT)
+            # 不使用隱含等待（每次找元素都會額外等待），各步驟改以時段時間預算內的條件等待；只限制頁面載入時間
+            self.driver.set_page_load_timeout(config.BROWSER_TIMEOUT)
             
             # 執行腳本來隱藏 webdriver 屬性
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+
+            # RPA 模式：以 DevTools 下載事件追蹤每一次下載
+            if self.rpa_mode and not attach_download_tracker(self.driver, download_folder):
+                print("⚠️ 無法啟用下載事件追蹤，改用資料夾輪詢")
+
+            # RPA 模式：封鎖不需要的圖片、字型與第三方資源（選用）
+            if self.rpa_mode and config.BLOCK_RESOURCES and not attach_resource_blocker(self.driver):
+                print("⚠️ 無法啟用資源封鎖")
             
             print("Chrome WebDriver 設定完成")
             return self.driver
             
         except Exception as e:
             print(f"設定 Chrome WebDriver 時發生錯誤: {e}")
+            # 啟動失敗的設定檔不保存為範本，直接刪除
+            if self.driver:
+                try:
+                    self.driver.quit()
+                except Exception:
+                    pass
+                self.driver = None
+            if self.profile_dir:
+                shutil.rmtree(self.profile_dir, ignore_errors=True)
+                self.profile_dir = None
             raise
     
     def close_driver(self):
-        """關閉瀏覽器"""
-        if self.driver:
-            self.driver.quit()
-            print("瀏覽器已關閉")
+        """關閉瀏覽器並刪除暫存設定檔（第一次正常關閉時保存為設定檔範本）"""
+        try:
+            if self.driver:
+                self.driver.quit()
+                print("瀏覽器已關閉")
+                if self.profile_dir:
+                    save_profile_template(self.profile_dir)
+        finally:
+            # session 已失效導致 quit 失敗時也要刪除暫存設定檔
+            self.driver = None
+            if self.profile_dir:
+                shutil.rmtree(self.profile_dir, ignore_errors=True)
+                self.profile_dir = None
     
     def __enter__(self):
         """Context manager 進入"""
@@ -0,0 +1,328 @@
+"""
+瀏覽器池 - 以多個已登入的 Chrome 同時處理下載時段
+"""
+
+import os
+import queue
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+import config
+from utils.logger import setup_logging
+from utils.metrics import metrics
+from .browser_chrome import BrowserManager
+from .login import login
+from .session_store import restore_or_login
+from ..download.download_excel import download_excel, query_row_count
+from ..download.slot_planner import plan_time_slots
+from ..download.slot_timer import SlotResult, ERROR
+from ..download.http_export import (
+    PortalHttpExporter, PortalSessionExpired, session_from_driver, download_excel_http
+)
+
+
+def start_browser(logger, download_folder=None):
+    """啟動 Chrome 並開啟網站首頁，失敗時回傳 None"""
+    logger.info("開啟 Chrome 瀏覽器...")
+
+    try:
+        browser = BrowserManager(rpa_mode=True, download_folder=download_folder)
+        browser.setup_driver()
+        logger.info("✓ Chrome 瀏覽器成功啟動")
+
+        # 開啟網頁
+        browser.driver.maximize_window()
+        browser.driver.get(config.WEBSITE_URL)
+        logger.info("✓ 成功開啟網頁")
+
+        return browser
+
+    except Exception as e:
+        logger.error(f"❌ 瀏覽器啟動失敗: {str(e)}")
+        return None
+
+
+class BrowserWorker:
+    """單一下載 worker：擁有自己的瀏覽器與下載資料夾"""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.name = f"worker-{worker_id}"
+        self.download_folder = os.path.join(config.WORKER_DOWNLOAD_FOLDER, self.name)
+        self.logger = setup_logging(f"下載流程[{self.name}]")
+        self.browser = None
+
+    def start(self):
+        """啟動瀏覽器並登入（先還原此 worker 保存的 session，無效才執行登入表單）"""
+        self.browser = start_browser(self.logger, self.download_folder)
+        if not self.browser:
+            return False
+        driver = self.browser.driver
+        with metrics.phase("login"):
+            return restore_or_login(driver, self.name, lambda: login(
+                driver, config.WEBSITE_USERNAME, config.WEBSITE_PASSWORD, self.logger), self.logger)
+
+    def session_alive(self):
+        """檢查瀏覽器 session 是否仍然有效"""
+        try:
+            self.browser.driver.current_url
+            return True
+        except Exception as e:
+            self.logger.error(f"❌ 瀏覽器 session 已失效：{e}")
+            return False
+
+    def recover(self):
+        """關閉失效的瀏覽器並重新啟動、登入"""
+        self.logger.info("🔄 嘗試重新啟動瀏覽器...")
+        metrics.inc("rpa_retries_total", kind="browser_restart")
+        try:
+            self.close()
+            if self.start():
+                self.logger.info("✅ 瀏覽器重新啟動成功")
+                return True
+            self.logger.error("❌ 無法重新啟動瀏覽器，停止此 worker")
+        except Exception as restart_error:
+            self.logger.error(f"❌ 重新啟動瀏覽器失敗：{restart_error}")
+        return False
+
+    def process(self, slot, handoff=None):
+        """下載單一時段，失敗時檢查 session 並視需要重啟瀏覽器
+
+        Returns:
+            tuple: (該時段的 SlotResult, worker 是否仍可繼續工作)
+        """
+        hour, start_minute, end_minute = slot
+        result = download_excel(self.browser.driver, hour, start_minute, end_minute,
+                                self.logger, download_dir=self.download_folder, handoff=handoff)
+        if result:
+            return result, True
+
+        self.logger.warning(f"⚠️ 時段 {hour}:{start_minute:02} ~ {hour}:{end_minute:02} 處理失敗（{result.status}）")
+        if self.session_alive():
+            self.logger.info("✅ 瀏覽器 session 仍然有效，繼續下一個時段")
+            return result, True
+        return result, self.recover()
+
+    def close(self):
+        """關閉此 worker 的瀏覽器"""
+        if self.browser and self.browser.driver:
+            try:
+                self.browser.close_driver()
+            except Exception as e:
+                self.logger.warning(f"⚠️ 關閉瀏覽器時發生錯誤：{e}")
+        self.browser = None
+
+
+class BrowserPool:
+    """瀏覽器池：N 個 worker 從共用佇列取出時段並同時下載"""
+
+    def __init__(self, size=None, logger=None):
+        self.size = max(1, size or config.BROWSER_POOL_SIZE)
+        self.logger = logger or setup_logging("瀏覽器池")
+        self.workers = []
+
+    def start(self):
+        """同時啟動所有 worker 並登入，回傳成功啟動的數量"""
+        candidates = [BrowserWorker(i + 1) for i in range(self.size)]
+        started = [False] * len(candidates)
+
+        def _start(index, worker):
+            try:
+                started[index] = worker.start()
+            except Exception as e:
+                worker.logger.error(f"❌ worker 啟動失敗: {e}")
+
+        threads = [threading.Thread(target=_start, args=(i, w), name=w.name)
+                   for i, w in enumerate(candidates)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for worker, ok in zip(candidates, started):
+            if ok:
+                self.workers.append(worker)
+            else:
+                worker.close()
+
+        self.logger.info(f"✓ 瀏覽器池啟動完成：{len(self.workers)}/{self.size} 個 worker 可用")
+        return len(self.workers)
+
+    def plan(self, base_slots):
+        """以所有 worker 同時查詢各時段筆數（每個 worker 一次處理一個小時），重新規劃下載時段"""
+        idle = queue.Queue()
+        for worker in self.workers:
+            idle.put(worker)
+
+        def count_rows(slot):
+            # 同一小時的查詢依序進行，取用任一閒置的 worker
+            worker = idle.get()
+            try:
+                return query_row_count(worker.browser.driver, *slot, worker.logger)
+            finally:
+                idle.put(worker)
+
+        return plan_time_slots(base_slots, count_rows, self.logger, parallelism=len(self.workers))
+
+    def run(self, slots, handoff=None):
+        """處理所有時段，回傳 {slot: SlotResult}（未處理的時段為 False）
+
+        handoff 有值時下載好的檔案交給管線的轉換階段，見 download_excel
+        """
+        pending = queue.Queue()
+        for slot in slots:
+            pending.put(slot)
+
+        results = {slot: False for slot in slots}
+        lock = threading.Lock()
+
+        def _work(worker):
+            while True:
+                try:
+                    slot = pending.get_nowait()
+                except queue.Empty:
+                    return
+                result, alive = worker.process(slot, handoff)
+                with lock:
+                    results[slot] = result
+                if not alive:
+                    worker.logger.error("❌ worker 已停止，剩餘時段交由其他 worker 處理")
+                    return
+
+        threads = [threading.Thread(target=_work, args=(w,), name=w.name) for w in self.workers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if not pending.empty():
+            self.logger.error(f"❌ 所有 worker 皆已停止，{pending.qsize()} 個時段未處理")
+
+        return results
+
+    def close(self):
+        """關閉所有 worker 的瀏覽器"""
+        for worker in self.workers:
+            worker.close()
+        self.workers = []
+        self.logger.info("瀏覽器池已關閉")
+
+    def __enter__(self):
+        """Context manager 進入"""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager 退出"""
+        self.close()
+
+
+class HttpExportPool:
+    """HTTP 匯出模式：瀏覽器只用來登入，之後多個時段共用同一個 HTTP session 同時匯出
+
+    介面與 BrowserPool 相同（start / run / close），session 失效時重新以瀏覽器登入
+    """
+
+    def __init__(self, size=None, logger=None):
+        self.size = max(1, size or config.HTTP_EXPORT_WORKERS)
+        self.logger = logger or setup_logging("HTTP 匯出")
+        self.download_folder = os.path.join(config.WORKER_DOWNLOAD_FOLDER, "http")
+        self.exporter = None
+        self._generation = 0  # 每次重新登入後遞增，避免多個執行緒重複登入
+        self._auth_lock = threading.Lock()
+
+    def _authenticate(self):
+        """啟動瀏覽器登入，取出 cookies 建立 HTTP session 後即關閉瀏覽器"""
+        browser = start_browser(self.logger, self.download_folder)
+        if not browser:
+            return False
+        try:
+            with metrics.phase("login"):
+                logged_in = restore_or_login(browser.driver, "http", lambda: login(
+                    browser.driver, config.WEBSITE_USERNAME, config.WEBSITE_PASSWORD, self.logger), self.logger)
+            if not logged_in:
+                return False
+            # 等待登入後的主選單出現，確保 session cookies 已寫入
+            WebDriverWait(browser.driver, 10).until(EC.presence_of_element_located((By.ID, "m0")))
+            session = session_from_driver(browser.driver, self.size)
+        except Exception as e:
+            self.logger.error(f"❌ 登入或取得 session 失敗: {e}")
+            return False
+        finally:
+            browser.close_driver()
+
+        # 舊的 session 可能仍有其他執行緒在使用，交由垃圾回收處理
+        self.exporter = PortalHttpExporter(session, self.logger)
+        self._generation += 1
+        self.logger.info("✓ 已取得登入 session，改以 HTTP 直接匯出")
+        return True
+
+    def _reauthenticate(self, seen_generation):
+        """session 失效時重新登入；若其他執行緒已完成重新登入則直接沿用"""
+        with self._auth_lock:
+            if self._generation != seen_generation:
+                return True
+            self.logger.info("🔄 session 已失效，重新登入...")
+            metrics.inc("rpa_retries_total", kind="portal_login")
+            return self._authenticate()
+
+    def start(self):
+        """登入並建立 HTTP session，回傳可用的 session 數（0 或 1）"""
+        with self._auth_lock:
+            return 1 if self._authenticate() else 0
+
+    def plan(self, base_slots):
+        """以 HTTP 查詢各時段筆數，重新規劃下載時段"""
+        date = (datetime.today() - timedelta(days=1)).strftime("%Y-%m-%d")
+
+        def count_rows(slot):
+            hour, start_minute, end_minute = slot
+            try:
+                return self.exporter.count_rows(date, f"{hour:02}:{start_minute:02}:00",
+                                                f"{hour:02}:{end_minute:02}:59")
+            except Exception as e:
+                self.logger.warning(f"⚠️ 無法取得 {hour}:{start_minute:02} ~ {hour}:{end_minute:02} 的資料筆數：{e}")
+                return None
+
+        return plan_time_slots(base_slots, count_rows, self.logger, parallelism=self.size)
+
+    def _process(self, slot, handoff=None):
+        hour, start_minute, end_minute = slot
+        error = "session 重新登入後仍然失效"
+        for _ in range(2):
+            generation, exporter = self._generation, self.exporter
+            try:
+                return download_excel_http(exporter, hour, start_minute, end_minute,
+                                           self.logger, download_dir=self.download_folder, handoff=handoff)
+            except PortalSessionExpired as e:
+                self.logger.warning(f"⚠️ {e}")
+                if not self._reauthenticate(generation):
+                    error = "重新登入失敗"
+                    break
+        self.logger.error(f"❌ 時段 {hour}:{start_minute:02} ~ {hour}:{end_minute:02} 下載失敗：{error}")
+        metrics.inc("rpa_slot_failures_total", reason=ERROR)
+        return SlotResult(ERROR, error=error)
+
+    def run(self, slots, handoff=None):
+        """處理所有時段，回傳 {slot: SlotResult}"""
+        with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="http-export") as executor:
+            return dict(zip(slots, executor.map(lambda slot: self._process(slot, handoff), slots)))
+
+    def close(self):
+        """關閉 HTTP session"""
+        if self.exporter:
+            self.exporter.session.close()
+            self.exporter = None
+        self.logger.info("HTTP 匯出 session 已關閉")
+
+    def __enter__(self):
+        """Context manager 進入"""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager 退出"""
+        self.close()
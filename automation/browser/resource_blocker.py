@@ -0,0 +1,108 @@
+"""
+資源封鎖 - 以 Chrome DevTools 的 Network.setBlockedURLs 封鎖操作入口網站不需要的圖片、字型與第三方腳本
+"""
+
+import threading
+import weakref
+import config
+from utils.metrics import metrics
+from ..utils.devtools import devtools_events
+
+# setBlockedURLs 只比對網址，資源類型依副檔名轉成網址規則
+RESOURCE_TYPE_EXTENSIONS = {
+    "Image": ["png", "jpg", "jpeg", "gif", "svg", "ico", "webp", "bmp"],
+    "Font": ["woff", "woff2", "ttf", "otf", "eot"],
+    "Stylesheet": ["css"],
+    "Media": ["mp4", "webm", "mp3", "wav", "ogg"],
+}
+
+# 被 setBlockedURLs 封鎖的請求在 Network.loadingFailed 中的 blockedReason
+BLOCKED_REASON = "inspector"
+
+# 每個 driver 對應一個資源封鎖器
+_blockers = weakref.WeakKeyDictionary()
+_blockers_lock = threading.Lock()
+
+
+def blocked_url_patterns(patterns=None, resource_types=None):
+    """組合 config 的網址規則與資源類型，回傳 setBlockedURLs 使用的網址規則"""
+    patterns = list(config.BLOCKED_URL_PATTERNS if patterns is None else patterns)
+    resource_types = config.BLOCKED_RESOURCE_TYPES if resource_types is None else resource_types
+    for resource_type in resource_types:
+        for extension in RESOURCE_TYPE_EXTENSIONS.get(resource_type, []):
+            patterns += [f"*.{extension}", f"*.{extension}?*"]
+    return patterns
+
+
+class ResourceBlocker:
+    """
+    計算被封鎖的請求數與實際傳輸的位元組數
+
+    事件來自共用的 DevTools 事件分派器（Network.loadingFailed / loadingFinished），
+    每個時段結束時以 take() 取出該時段的數字
+    """
+
+    def __init__(self, driver):
+        self.events = devtools_events(driver)
+        self.events.subscribe("Network.loadingFailed", self._on_failed)
+        self.events.subscribe("Network.loadingFinished", self._on_finished)
+        self._lock = threading.Lock()
+        self._blocked = {}  # 資源類型 -> 封鎖數（自上次 take() 起）
+        self._bytes = 0
+
+    def _on_failed(self, method, params):
+        if params.get("blockedReason") != BLOCKED_REASON:
+            return
+        resource_type = params.get("type", "Other")
+        with self._lock:
+            self._blocked[resource_type] = self._blocked.get(resource_type, 0) + 1
+        metrics.inc("rpa_blocked_requests_total", type=resource_type)
+
+    def _on_finished(self, method, params):
+        size = int(params.get("encodedDataLength") or 0)
+        with self._lock:
+            self._bytes += size
+        metrics.inc("rpa_page_bytes_total", size)
+
+    def take(self):
+        """讀取暫存的事件，回傳自上次呼叫以來的 ({資源類型: 封鎖數}, 傳輸位元組數) 並重新計算"""
+        self.events.poll()
+        with self._lock:
+            blocked, size = self._blocked, self._bytes
+            self._blocked, self._bytes = {}, 0
+        return blocked, size
+
+    def summary(self):
+        """本時段的封鎖摘要，例如「封鎖 12 個請求（Image 9, Font 3），傳輸 84.2 KB」"""
+        blocked, size = self.take()
+        detail = ", ".join(f"{resource_type} {count}" for resource_type, count in sorted(blocked.items()))
+        text = f"封鎖 {sum(blocked.values())} 個請求"
+        if detail:
+            text += f"（{detail}）"
+        return f"{text}，傳輸 {size / 1024:.1f} KB"
+
+
+def attach_resource_blocker(driver, patterns=None):
+    """
+    啟用資源封鎖並建立計數器；瀏覽器不支援時回傳 None
+
+    Args:
+        patterns: 網址規則，未指定時依 config.BLOCKED_URL_PATTERNS 與 config.BLOCKED_RESOURCE_TYPES 組合
+    """
+    patterns = blocked_url_patterns() if patterns is None else patterns
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception:
+        return None
+
+    blocker = ResourceBlocker(driver)
+    with _blockers_lock:
+        _blockers[driver] = blocker
+    return blocker
+
+
+def get_resource_blocker(driver):
+    """取得 driver 的資源封鎖器，未啟用時回傳 None"""
+    with _blockers_lock:
+        return _blockers.get(driver)
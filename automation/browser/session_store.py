@@ -0,0 +1,202 @@
+"""
+登入 session 保存 - 登入成功後將 cookies 與 localStorage / sessionStorage 加密保存，重新啟動瀏覽器時先還原再驗證
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import secrets
+import time
+import config
+from utils.metrics import metrics
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # 未安裝 cryptography 時不保存 session（不會以明文寫入）
+    Fernet = None
+    InvalidToken = Exception
+
+# 檔案格式：標記 + scrypt salt + Fernet token
+FILE_MAGIC = b"RPS1"
+SALT_SIZE = 16
+
+# 讀取 localStorage / sessionStorage 的內容
+READ_STORAGE_SCRIPT = """
+    const dump = storage => Object.fromEntries(
+        Array.from({length: storage.length}, (_, i) => storage.key(i)).map(key => [key, storage.getItem(key)])
+    );
+    return {local: dump(window.localStorage), session: dump(window.sessionStorage)};
+"""
+
+CLEAR_STORAGE_SCRIPT = """
+    window.localStorage.clear();
+    window.sessionStorage.clear();
+"""
+
+WRITE_STORAGE_SCRIPT = """
+    for (const [key, value] of Object.entries(arguments[0])) window.localStorage.setItem(key, value);
+    for (const [key, value] of Object.entries(arguments[1])) window.sessionStorage.setItem(key, value);
+"""
+
+# 頁面已載入完成且不是登入表單
+LOGGED_IN_SCRIPT = """
+    return document.readyState === 'complete' && document.getElementsByName('user_name').length === 0;
+"""
+
+
+def _derive_key(secret: str, salt: bytes) -> bytes:
+    """以 scrypt 由密鑰字串與 salt 產生 Fernet 金鑰"""
+    raw = hashlib.scrypt(secret.encode("utf-8"), salt=salt, n=2 ** 14, r=8, p=1, dklen=32)
+    return base64.urlsafe_b64encode(raw)
+
+
+class SessionStore:
+    """
+    單一瀏覽器（worker）的登入 session 保存檔
+
+    入口網站可能以 session 保存查詢條件，因此每個 worker 各自一個檔案，不共用同一個 session；
+    加密密鑰為 config.SESSION_STORE_KEY，未設定時使用登入密碼
+    """
+
+    def __init__(self, name: str, logger=None):
+        self.name = name
+        self.path = os.path.join(config.SESSION_STORE_FOLDER, f"{name}.session")
+        self.logger = logger or logging.getLogger(__name__)
+
+    @property
+    def secret(self):
+        return config.SESSION_STORE_KEY or config.WEBSITE_PASSWORD
+
+    @property
+    def enabled(self) -> bool:
+        return config.SESSION_REUSE and Fernet is not None and bool(self.secret)
+
+    def _write(self, data: dict):
+        """加密後寫入暫存檔再改名，檔案權限僅限擁有者讀寫"""
+        salt = secrets.token_bytes(SALT_SIZE)
+        token = Fernet(_derive_key(self.secret, salt)).encrypt(json.dumps(data).encode("utf-8"))
+        os.makedirs(config.SESSION_STORE_FOLDER, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(FILE_MAGIC + salt + token)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.path)
+
+    def _read(self):
+        """解密保存檔，不存在、無法解密或已超過 config.SESSION_MAX_AGE 時回傳 None"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                blob = f.read()
+            if not blob.startswith(FILE_MAGIC):
+                raise ValueError("檔案格式不符")
+            salt = blob[len(FILE_MAGIC):len(FILE_MAGIC) + SALT_SIZE]
+            token = blob[len(FILE_MAGIC) + SALT_SIZE:]
+            data = json.loads(Fernet(_derive_key(self.secret, salt)).decrypt(token))
+        except (OSError, ValueError, InvalidToken) as e:
+            self.logger.warning(f"⚠️ 無法讀取保存的 session，改用登入表單: {e or type(e).__name__}")
+            self.clear()
+            return None
+
+        if time.time() - data.get("saved_at", 0) > config.SESSION_MAX_AGE:
+            self.clear()
+            return None
+        return data
+
+    def clear(self):
+        """刪除保存的 session"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def save(self, driver) -> bool:
+        """登入完成後保存 cookies 與 storage（等待頁面離開登入表單，逾時則不保存）"""
+        if not self.enabled:
+            return False
+        try:
+            deadline = time.monotonic() + config.SESSION_CHECK_TIMEOUT
+            while not driver.execute_script(LOGGED_IN_SCRIPT):
+                if time.monotonic() > deadline:
+                    return False
+                time.sleep(0.1)
+            storage = driver.execute_script(READ_STORAGE_SCRIPT) or {}
+            self._write({
+                "saved_at": time.time(),
+                "cookies": driver.get_cookies(),
+                "local_storage": storage.get("local", {}),
+                "session_storage": storage.get("session", {}),
+            })
+            self.logger.info("🔐 已加密保存登入 session")
+            return True
+        except Exception as e:
+            self.logger.warning(f"⚠️ 保存登入 session 失敗: {e}")
+            return False
+
+    def restore(self, driver) -> bool:
+        """
+        還原保存的 session 並以一次頁面請求（config.SESSION_CHECK_URL）驗證仍有效
+
+        瀏覽器需已開啟入口網站的頁面（cookies 與 storage 只能寫入目前的網域）；
+        驗證成功時瀏覽器停在驗證頁面，失敗時刪除保存檔、清除還原的 cookies 與 storage 並回到首頁（登入表單）
+        """
+        if not self.enabled:
+            return False
+        data = self._read()
+        if not data:
+            return False
+
+        try:
+            now = time.time()
+            for cookie in data["cookies"]:
+                if cookie.get("expiry") and cookie["expiry"] < now:
+                    continue
+                cookie = dict(cookie)
+                if "expiry" in cookie:
+                    cookie["expiry"] = int(cookie["expiry"])
+                driver.add_cookie(cookie)
+            driver.execute_script(WRITE_STORAGE_SCRIPT, data.get("local_storage", {}), data.get("session_storage", {}))
+
+            driver.get(config.SESSION_CHECK_URL)
+            redirected = driver.current_url.rstrip("/").startswith(config.LOGIN_URL)
+            if redirected or not driver.execute_script(LOGGED_IN_SCRIPT):
+                raise ValueError("session 已失效")
+        except Exception as e:
+            self.logger.info(f"🔑 保存的 session 無法使用（{e}），改用登入表單")
+            self.clear()
+            # 清除還原的 cookies 與 storage，登入表單不可沿用失效 session 的頁面狀態
+            try:
+                driver.delete_all_cookies()
+                driver.execute_script(CLEAR_STORAGE_SCRIPT)
+            except Exception:
+                pass
+            try:
+                driver.get(config.WEBSITE_URL)
+            except Exception:
+                pass
+            return False
+
+        self.logger.info("✓ 已還原保存的登入 session，略過登入表單")
+        return True
+
+
+def restore_or_login(driver, name, login_func, logger=None):
+    """
+    先還原 name 的保存 session，無效時才執行登入表單，登入成功後保存 session
+
+    Args:
+        login_func: 登入表單流程，例如 lambda: login(driver, username, password, logger)
+    """
+    store = SessionStore(name, logger)
+    if store.restore(driver):
+        metrics.inc("rpa_logins_total", method="session")
+        return True
+
+    if not login_func():
+        return False
+    metrics.inc("rpa_logins_total", method="form")
+    store.save(driver)
+    return True
@@ -4,8 +4,21 @@ Download 模組 - 檔案下載和重命名功能
 
 from .download_excel import download_excel
 from .rename_query_file import rename_query_file
+from .slot_timer import SlotTimer, SlotTimeout, SlotResult
+from .download_tracker import DownloadTracker, attach_download_tracker, get_download_tracker
+from .http_export import PortalHttpExporter, PortalSessionExpired, session_from_driver, download_excel_http
 
 __all__ = [
     "download_excel",
-    "rename_query_file"
+    "rename_query_file",
+    "SlotTimer",
+    "SlotTimeout",
+    "SlotResult",
+    "DownloadTracker",
+    "attach_download_tracker",
+    "get_download_tracker",
+    "PortalHttpExporter",
+    "PortalSessionExpired",
+    "session_from_driver",
+    "download_excel_http"
 ] 
\ No newline at end of file
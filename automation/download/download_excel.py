@@ -1,16 +1,119 @@
+from selenium.common.exceptions import StaleElementReferenceException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from datetime import datetime, timedelta
-from .rename_query_file import rename_query_file
+from .rename_query_file import wait_for_query_file, convert_query_file, stage_query_file
+from .download_tracker import get_download_tracker
+from ..browser.resource_blocker import get_resource_blocker
+from .slot_timer import SlotTimer, SlotResult, ERROR, ajax_idle
+from utils.metrics import metrics
 import logging
-import time
+import os
+import re
 import config
 
-def download_excel(driver, hour, start_minute, end_minute, logger=None):
+# 找出可見的「Export to EXCEL」連結
+EXPORT_LINK_SCRIPT = """
+    return [...document.querySelectorAll('a.click-btn')]
+        .find(el => el.textContent.trim() === 'Export to EXCEL' && el.offsetParent !== null) || null;
+"""
+
+# 在目前 iframe 的頁面上留下標記：重新載入後標記消失，藉此分辨是否已是新的頁面
+MARK_FRAME_STALE_SCRIPT = """
+    const frame = document.getElementById('iframepagef2');
+    try {
+        if (frame && frame.contentWindow) frame.contentWindow.__rpaStale = true;
+    } catch (e) {}
+"""
+
+FRAME_FRESH_SCRIPT = "return !window.__rpaStale;"
+
+
+def is_stale(element):
+    """元素已從頁面移除（或所在頁面已重新載入）"""
+    try:
+        element.is_enabled()
+        return False
+    except StaleElementReferenceException:
+        return True
+
+
+def run_query(driver, timer, hour, start_minute, end_minute, logger):
+    """
+    開啟 Log Data 頁面，設定昨天的日期與時間區間並執行查詢（執行後停留在 iframe 內）
+
+    前一個時段的 iframe 與查詢結果仍在頁面上，因此每個等待都要確認是這次的頁面與查詢結果，
+    不能只看元素是否存在
+    """
+    # 點擊主選單的「Log Data」（等待首頁加載完成、選單可點擊）
+    log_data_btn = timer.wait(driver, "menu", EC.element_to_be_clickable((By.ID, "m0")))
+    driver.execute_script(MARK_FRAME_STALE_SCRIPT)
+    log_data_btn.click()
+
+    # 🔄 切換到 iframe（根據你的 HTML 應該是 iframe id 為 iframepagef2），等待重新載入完成（沒有前一個時段的標記）
+    timer.wait(driver, "iframe", EC.frame_to_be_available_and_switch_to_it("iframepagef2"))
+    timer.wait(driver, "iframe_ready", lambda d: (
+        ajax_idle(d) and d.execute_script(FRAME_FRESH_SCRIPT) and d.find_elements(By.ID, "query_btn")
+    ))
+
+    # 點擊查詢按鈕，觸發表單區塊出現
+    driver.execute_script("document.querySelector('#query_btn').click();")
+
+    # 準備昨天的日期
+    date = (datetime.today() - timedelta(days=1)).strftime("%Y-%m-%d")
+    from_time = f"{hour:02}:{start_minute:02}:00"
+    to_time = f"{hour:02}:{end_minute:02}:59"
+
+    # 設定日期欄位（minDate, maxDate）與時間欄位（minTime, maxTime）
+    timer.wait(driver, "form", lambda d: all(
+        d.find_elements(By.ID, field_id) for field_id in ("minDate", "maxDate", "minTime", "maxTime")
+    ))
+    driver.execute_script("""
+        const minInput = document.getElementById('minDate');
+        const maxInput = document.getElementById('maxDate');
+        if (minInput && maxInput) {
+            minInput.value = arguments[0];
+            maxInput.value = arguments[0];
+            minInput.dispatchEvent(new Event('change'));
+            maxInput.dispatchEvent(new Event('change'));
+        }
+    """, date)
+
+    driver.execute_script("""
+        const minT = document.getElementById('minTime');
+        const maxT = document.getElementById('maxTime');
+        if (minT && maxT) {
+            minT.value = arguments[0];
+            maxT.value = arguments[1];
+            minT.dispatchEvent(new Event('change'));
+            maxT.dispatchEvent(new Event('change'));
+        }
+    """, from_time, to_time)
+
+    logger.info(f"✓ 已設定日期 {date}，時間區間 {from_time} ~ {to_time}")
+
+    # ✅ 執行查詢（再次點擊查詢按鈕），等待這次的查詢結果載入（已有的匯出按鈕需先被取代）
+    previous = driver.find_elements(By.ID, "export_btn")
+    driver.execute_script("document.querySelector('#query_btn').click();")
+    timer.wait(driver, "query", lambda d: (
+        all(is_stale(element) for element in previous)
+        and ajax_idle(d) and d.find_elements(By.ID, "export_btn")
+    ))
+
+def download_excel(driver, hour, start_minute, end_minute, logger=None, download_dir=None, handoff=None):
+    """
+    下載單一時段的 Excel 並轉成 CSV
+
+    handoff(slot, date, raw_file) 有值時不在此轉換，而是把下載好的檔案交給下一個階段（管線模式）
+
+    Returns:
+        SlotResult: 成功時為 True；失敗時 status 標示逾時原因（step_timeout / deadline）或 error
+    """
     if logger is None:
         logger = logging.getLogger(__name__)
 
+    timer = SlotTimer()
+    original_window = None
     try:
         # 檢查瀏覽器 session 是否有效
         try:
@@ -18,78 +121,20 @@ def download_excel(driver, hour, start_minute, end_minute, logger=None):
             logger.info("✅ 瀏覽器 session 有效")
         except Exception as e:
             logger.error(f"❌ 瀏覽器 session 無效：{e}")
-            return False
+            metrics.inc("rpa_slot_failures_total", reason=ERROR)
+            return SlotResult(ERROR, error=str(e))
         
-        wait = WebDriverWait(driver, 10)
         logger.info(f"⏱ 開始下載：{hour}:{start_minute:02} 到 {hour}:{end_minute:02}")
 
-        time.sleep(5)  # 等待首頁加載完成
-
-        # 點擊主選單的「Log Data」
-        log_data_btn = wait.until(EC.element_to_be_clickable((By.ID, "m0")))
-        log_data_btn.click()
-        time.sleep(3)  # 等待頁面切換
-
-        # 🔄 切換到 iframe（根據你的 HTML 應該是 iframe id 為 iframepagef2）
-        driver.switch_to.frame("iframepagef2")
-
-        # 點擊查詢按鈕，觸發表單區塊出現
-        driver.execute_script("document.querySelector('#query_btn').click();")
-        time.sleep(1)
-
-        # 準備昨天的日期
-        date = (datetime.today() - timedelta(days=1)).strftime("%Y-%m-%d")
-        from_time = f"{hour:02}:{start_minute:02}:00"
-        to_time = f"{hour:02}:{end_minute:02}:59"
-
-        # 設定日期欄位（minDate, maxDate）
-        wait.until(EC.presence_of_element_located((By.ID, "minDate")))
-        wait.until(EC.presence_of_element_located((By.ID, "maxDate")))
-        driver.execute_script("""
-            const minInput = document.getElementById('minDate');
-            const maxInput = document.getElementById('maxDate');
-            if (minInput && maxInput) {
-                minInput.value = arguments[0];
-                maxInput.value = arguments[0];
-                minInput.dispatchEvent(new Event('change'));
-                maxInput.dispatchEvent(new Event('change'));
-            }
-        """, date)
-
-        # 設定時間欄位（minTime, maxTime）
-        wait.until(EC.presence_of_element_located((By.ID, "minTime")))
-        wait.until(EC.presence_of_element_located((By.ID, "maxTime")))
-        driver.execute_script("""
-            const minT = document.getElementById('minTime');
-            const maxT = document.getElementById('maxTime');
-            if (minT && maxT) {
-                minT.value = arguments[0];
-                maxT.value = arguments[1];
-                minT.dispatchEvent(new Event('change'));
-                maxT.dispatchEvent(new Event('change'));
-            }
-        """, from_time, to_time)
-
-        logger.info(f"✓ 已設定日期 {date}，時間區間 {from_time} ~ {to_time}")
-
-        # ✅ 執行查詢（再次點擊查詢按鈕）
-        driver.execute_script("document.querySelector('#query_btn').click();")
-        time.sleep(2)
-
-        # ✅ 點擊「匯出」按鈕
-        driver.execute_script("document.querySelector('#export_btn').click();")
-        time.sleep(2)
-
-        driver.execute_script("""
-            [...document.querySelectorAll('a.click-btn')]
-                .find(el => el.textContent.trim() === 'Export to EXCEL')
-                ?.click();
-        """)
-        time.sleep(2)
+        run_query(driver, timer, hour, start_minute, end_minute, logger)
 
+        # ✅ 點擊「匯出」按鈕，等待匯出選單出現後點擊「Export to EXCEL」
+        driver.execute_script("document.querySelector('#export_btn').click();")
+        export_link = timer.wait(driver, "export_menu", lambda d: d.execute_script(EXPORT_LINK_SCRIPT))
+        driver.execute_script("arguments[0].click();", export_link)
 
         # 1️⃣ 等待 JavaScript alert 彈出（例如：大量資料請稍候）
-        WebDriverWait(driver, 10).until(EC.alert_is_present())
+        timer.wait(driver, "alert", EC.alert_is_present())
         alert = driver.switch_to.alert
         logger.info(f"📢 彈跳視窗內容：{alert.text}")
         alert.accept()  # 點擊「確定」
@@ -100,7 +145,7 @@ def download_excel(driver, hour, start_minute, end_minute, logger=None):
         logger.info("📌 記錄原本的瀏覽器 Tab")
 
         # 🔁 等待新 Tab 開啟（總共應變成 2 個）
-        WebDriverWait(driver, 10).until(lambda d: len(d.window_handles) > 1)
+        timer.wait(driver, "new_tab", lambda d: len(d.window_handles) > 1)
 
         # 切換到新開的 Tab（找到不是原本的那個）
         for handle in driver.window_handles:
@@ -110,30 +155,105 @@ def download_excel(driver, hour, start_minute, end_minute, logger=None):
                 break
 
         # ✅ 等待「Download File」的連結出現並點擊
-        download_link = WebDriverWait(driver, config.DOWNLOAD_TIMEOUT).until(
-            EC.element_to_be_clickable((By.PARTIAL_LINK_TEXT, "Download File"))
-        )
+        download_link = timer.wait(driver, "download_link",
+                                   EC.element_to_be_clickable((By.PARTIAL_LINK_TEXT, "Download File")))
+        # 📡 有下載追蹤器時，點擊後出現的第一個下載即為這次匯出的檔案
+        tracker = get_download_tracker(driver)
+        if tracker:
+            tracker.expect()
         download_link.click()
         logger.info("📥 成功點擊下載連結")
 
-        # 🔙 可選：下載完畢後關閉新 Tab，並切回原本頁面
+        guid = None
+        if tracker:
+            with timer.step("download_start"):
+                guid = tracker.wait_started(timer.timeout_for("download_start"))
+            if not guid:
+                raise timer.timeout("download_start")
+            logger.info(f"📡 下載開始（GUID：{guid}）")
+
+        # 🔙 可選：下載開始後關閉新 Tab，並切回原本頁面
         driver.close()
         driver.switch_to.window(original_window)
         logger.info("🔄 關閉下載 Tab 並切回原本頁面")
         
-        # 等待檔案下載完成
-        time.sleep(5)  # 給檔案下載 5 秒時間
-        
+        # 等待檔案下載完成：有追蹤器時依 GUID 等待完成事件，否則輪詢下載資料夾
         date = (datetime.today() - timedelta(days=1)).strftime("%Y%m%d")
-        rename_query_file(driver, date, hour, start_minute, end_minute, logger)
-        return True
+        with timer.step("download"):
+            downloaded_file = None
+            if tracker:
+                try:
+                    downloaded_file = tracker.wait_finished(guid, timer.timeout_for("download"))
+                except TimeoutError:
+                    raise timer.timeout("download") from None
+                logger.info(f"✓ 下載完成：{os.path.basename(downloaded_file)}")
+            try:
+                matched_file = wait_for_query_file(download_dir, downloaded_file, logger,
+                                                   timeout=timer.timeout_for("download"))
+            except FileNotFoundError:
+                raise timer.timeout("download") from None
+
+        # 改名為時段專用的原始檔並記錄到執行清單；管線模式交給轉換階段處理，瀏覽器立即進行下一個時段，否則直接轉換
+        staged = stage_query_file(matched_file, date, hour, start_minute, end_minute, seconds=timer.total)
+        if handoff:
+            handoff((hour, start_minute, end_minute), date, staged)
+        else:
+            with timer.step("convert"):
+                convert_query_file(staged, date, hour, start_minute, end_minute, logger)
+        return SlotResult(seconds=timer.total)
 
     except Exception as e:
-        logger.error(f"❌ 下載流程錯誤: {str(e)}")
+        result = SlotResult.from_exception(e, timer.total)
+        logger.error(f"❌ 下載流程錯誤（{result.status}）: {str(e)}")
+        metrics.inc("rpa_slot_failures_total", reason=result.status)
         try:
-            driver.close()
-            driver.switch_to.window(original_window)
-            logger.info("🔄 關閉下載 Tab 並切回原本頁面")
+            if original_window and driver.current_window_handle != original_window:
+                driver.close()
+                driver.switch_to.window(original_window)
+                logger.info("🔄 關閉下載 Tab 並切回原本頁面")
         except:
             pass
-        return False
+        return result
+
+    finally:
+        # 失敗時可能仍停留在 iframe 內，回到最上層頁面，否則下一個時段找不到主選單
+        try:
+            driver.switch_to.default_content()
+        except Exception:
+            pass
+        logger.info(f"⏱ 步驟耗時（共 {timer.total:.2f}s）：{timer.summary()}")
+        blocker = get_resource_blocker(driver)
+        if blocker:
+            logger.info(f"🚫 資源封鎖：{blocker.summary()}")
+
+
+def query_row_count(driver, hour, start_minute, end_minute, logger=None):
+    """
+    只執行查詢不匯出，回傳入口網站回報的資料筆數（讀取失敗時回傳 None）
+
+    筆數以 config.PORTAL_ROW_COUNT_PATTERN 從查詢結果頁面文字中擷取
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+
+    timer = SlotTimer()
+    try:
+        run_query(driver, timer, hour, start_minute, end_minute, logger)
+        text = driver.execute_script("return document.body.innerText;")
+        return parse_row_count(text)
+    except Exception as e:
+        logger.warning(f"⚠️ 無法取得 {hour}:{start_minute:02} ~ {hour}:{end_minute:02} 的資料筆數：{e}")
+        return None
+    finally:
+        try:
+            driver.switch_to.default_content()
+        except Exception:
+            pass
+
+
+def parse_row_count(text):
+    """從查詢結果文字中擷取資料筆數，找不到時回傳 None"""
+    match = re.search(config.PORTAL_ROW_COUNT_PATTERN, text or "")
+    if not match:
+        return None
+    return int(match.group(1).replace(",", ""))
@@ -0,0 +1,164 @@
+"""
+下載追蹤 - 以 Chrome DevTools 下載事件對應每一次匯出的下載檔案
+"""
+
+import os
+import re
+import threading
+import time
+import weakref
+import config
+from ..utils.devtools import devtools_events
+
+# allowAndName 存檔時使用的下載 GUID 檔名
+GUID_FILE_PATTERN = re.compile(r"^[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}$")
+
+# 每個 driver 對應一個下載追蹤器
+_trackers = weakref.WeakKeyDictionary()
+_trackers_lock = threading.Lock()
+
+
+class DownloadTracker:
+    """
+    追蹤瀏覽器的下載
+
+    下載行為設為 allowAndName 後，Chrome 以下載 GUID 作為檔名存檔，
+    並送出 downloadWillBegin / downloadProgress 事件。
+    呼叫 expect() 後出現的第一個下載即屬於這次匯出，之後以 GUID 等待該檔案完成，
+    不需要掃描資料夾或猜測最新的檔案。
+
+    若 performance log 收不到下載事件（尚未收到過任何下載事件時），
+    改以 expect() 之後下載資料夾中新出現的 GUID 檔名判斷下載開始，完成與否則依檔案大小判斷
+    """
+
+    def __init__(self, driver, download_dir):
+        self.download_dir = download_dir
+        self.events = devtools_events(driver)
+        self.events.subscribe("Page.download", self._on_event)
+        self.events.subscribe("Browser.download", self._on_event)
+        self._downloads = {}  # guid -> {"filename", "state", "total"}
+        self._order = []  # 依開始順序排列的 guid
+        self._cursor = 0
+        self._existing = set()  # expect() 時下載資料夾中已有的檔案
+        self.events_seen = False
+
+    def _on_event(self, method, params):
+        guid = params.get("guid")
+        if not guid:
+            return
+        self.events_seen = True
+        if method.endswith("downloadWillBegin"):
+            if guid not in self._downloads:
+                self._order.append(guid)
+            info = self._downloads.setdefault(guid, {"state": "inProgress", "total": 0})
+            info["filename"] = params.get("suggestedFilename")
+        elif method.endswith("downloadProgress"):
+            info = self._downloads.setdefault(guid, {"state": "inProgress", "total": 0})
+            info["state"] = params.get("state", info["state"])
+            info["total"] = params.get("totalBytes") or info["total"]
+
+    def _list_files(self):
+        try:
+            return set(os.listdir(self.download_dir))
+        except OSError:
+            return set()
+
+    def expect(self):
+        """在觸發下載前呼叫：之後開始的第一個下載即為這次匯出的檔案"""
+        self.events.poll()
+        self._cursor = len(self._order)
+        self._existing = self._list_files()
+
+    def _new_guid_file(self):
+        """expect() 之後下載資料夾中新出現的 GUID 檔名（收不到下載事件時使用）"""
+        for name in sorted(self._list_files() - self._existing):
+            if GUID_FILE_PATTERN.match(name):
+                self._existing.add(name)
+                return name
+        return None
+
+    def wait_started(self, timeout):
+        """等待 expect() 之後的下載開始，回傳下載 GUID，逾時回傳 None"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            self.events.poll()
+            if len(self._order) > self._cursor:
+                guid = self._order[self._cursor]
+                self._cursor += 1
+                return guid
+            if not self.events_seen:
+                guid = self._new_guid_file()
+                if guid:
+                    return guid
+            time.sleep(config.DOWNLOAD_POLL_INTERVAL)
+        return None
+
+    def _file_complete(self, guid, info, progress):
+        """
+        事件未回報完成時，以檔案判斷是否完成
+
+        allowAndName 會直接寫入 <guid>，下載期間檔案已存在並持續變大，
+        因此只有大小等於 totalBytes，或大小維持 config.DOWNLOAD_STABLE_SECONDS 不變時才視為完成；
+        progress 為 (上次大小, 大小開始不變的時間)，回傳 (是否完成, 新的 progress)
+        """
+        path = os.path.join(self.download_dir, guid)
+        if not os.path.exists(path) or os.path.exists(path + ".crdownload"):
+            return False, (None, None)
+        size = os.path.getsize(path)
+        if info.get("total") and size == info["total"]:
+            return True, (size, None)
+
+        last_size, stable_since = progress
+        now = time.monotonic()
+        if size != last_size or not size:
+            return False, (size, now)
+        return now - stable_since >= config.DOWNLOAD_STABLE_SECONDS, (size, stable_since)
+
+    def wait_finished(self, guid, timeout):
+        """等待指定 GUID 的下載完成，回傳檔案路徑（以建議檔名結尾，例如 <guid>_query.xls）"""
+        deadline = time.monotonic() + timeout
+        progress = (None, None)
+        while time.monotonic() < deadline:
+            self.events.poll()
+            info = self._downloads.get(guid, {})
+            state = info.get("state")
+            if state == "canceled":
+                raise Exception(f"❌ 下載已被取消（{guid}）")
+
+            complete, progress = self._file_complete(guid, info, progress)
+            if state == "completed" or complete:
+                return self._finalize(guid, info)
+            time.sleep(config.DOWNLOAD_POLL_INTERVAL)
+
+        raise TimeoutError(f"❌ 等待下載完成逾時（{guid}）")
+
+    def _finalize(self, guid, info):
+        """將 GUID 檔名改為帶建議檔名的名稱，方便後續依副檔名處理"""
+        source = os.path.join(self.download_dir, guid)
+        target = os.path.join(self.download_dir, f"{guid}_{info.get('filename') or 'query.xls'}")
+        os.replace(source, target)
+        self._downloads.pop(guid, None)
+        return target
+
+
+def attach_download_tracker(driver, download_dir):
+    """設定下載行為並建立追蹤器；瀏覽器不支援時回傳 None（改用資料夾輪詢）"""
+    try:
+        driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+            "behavior": "allowAndName",
+            "downloadPath": download_dir,
+            "eventsEnabled": True,
+        })
+    except Exception:
+        return None
+
+    tracker = DownloadTracker(driver, download_dir)
+    with _trackers_lock:
+        _trackers[driver] = tracker
+    return tracker
+
+
+def get_download_tracker(driver):
+    """取得 driver 的下載追蹤器，未啟用時回傳 None"""
+    with _trackers_lock:
+        return _trackers.get(driver)
@@ -0,0 +1,282 @@
+"""
+入口網站匯出檔讀取 - 不依賴 Excel COM，直接以 Python 讀取 .xls 匯出檔
+
+入口網站的「Export to EXCEL」實際上可能是 HTML 表格、純文字（Tab / 逗號分隔）、
+BIFF 格式的 .xls 或 .xlsx，這裡依檔案內容判斷格式並逐列回傳儲存格文字
+"""
+
+import csv
+import codecs
+import threading
+from html.parser import HTMLParser
+
+# 讀取文字格式匯出檔時依序嘗試的編碼
+TEXT_ENCODINGS = ['utf-8', 'big5', 'gbk', 'cp950', 'latin1']
+
+OLE_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_SIGNATURE = b"PK\x03\x04"
+
+# 串流讀取時每次讀入的大小
+READ_BLOCK_SIZE = 256 * 1024
+
+# 判斷編碼時取樣的大小
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+# BIFF 日期儲存格輸出的格式（與 Time 欄位一致）
+BIFF_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 判斷文字格式分隔符號時讀取的列數（需涵蓋 6 列標題說明與欄位名稱列）
+DELIMITER_SAMPLE_LINES = 8
+
+# 已判斷過的編碼（依來源記住，本次執行期間有效）
+DEFAULT_ENCODING_SOURCE = "portal"
+_detected_encodings = {}
+_encoding_lock = threading.Lock()
+
+
+def sniff_export_format(path):
+    """依檔案開頭判斷匯出檔格式：'biff'、'xlsx'、'html' 或 'text'"""
+    with open(path, "rb") as f:
+        head = f.read(2048)
+
+    if head.startswith(OLE_SIGNATURE):
+        return "biff"
+    if head.startswith(ZIP_SIGNATURE):
+        return "xlsx"
+    if _has_utf16_bom(head):
+        head = head.decode("utf-16", errors="ignore").encode("utf-8")
+    lowered = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if lowered.startswith(b"<") or b"<table" in lowered or b"<html" in lowered:
+        return "html"
+    return "text"
+
+
+class _TableRowParser(HTMLParser):
+    """將 HTML 表格的 <tr> / <td> 轉成列資料（可分段 feed，已完成的列放在 rows 等待取出）"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._finish_row()
+            self._row = []
+        elif tag in ("td", "th"):
+            self._finish_cell()
+            if self._row is None:
+                self._row = []
+            self._cell = []
+        elif tag == "br" and self._cell is not None:
+            self._cell.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th"):
+            self._finish_cell()
+        elif tag in ("tr", "table"):
+            self._finish_row()
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def _finish_cell(self):
+        if self._cell is not None:
+            self._row.append(" ".join("".join(self._cell).split()))
+            self._cell = None
+
+    def _finish_row(self):
+        self._finish_cell()
+        if self._row:
+            self.rows.append(self._row)
+        self._row = None
+
+    def close(self):
+        super().close()
+        self._finish_row()
+
+    def take_rows(self):
+        """取出目前已完成的列並清空暫存"""
+        rows, self.rows = self.rows, []
+        return rows
+
+
+def _has_utf16_bom(data):
+    return data.startswith((b"\xff\xfe", b"\xfe\xff"))
+
+
+def _sample_encoding(sample):
+    """以固定大小的樣本判斷編碼（樣本結尾可能切到多位元組字元，因此不做 final 解碼）"""
+    for encoding in TEXT_ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise Exception("❌ 無法使用任何編碼讀取匯出檔")
+
+
+def detect_export_encoding(path, source=DEFAULT_ENCODING_SOURCE):
+    """
+    判斷匯出檔編碼，結果依來源（source）記住，本次執行中同來源的後續檔案直接沿用
+
+    只取第一段含非 ASCII 字元的固定大小樣本判斷一次；整個檔案都是 ASCII 時回傳 utf-8 且不記住
+    """
+    with _encoding_lock:
+        if source in _detected_encodings:
+            return _detected_encodings[source]
+
+    with open(path, "rb") as f:
+        block = f.read(ENCODING_SAMPLE_SIZE)
+        if _has_utf16_bom(block):
+            encoding = "utf-16"
+        else:
+            # 跳過純 ASCII 的開頭（例如 HTML 標頭），從第一個非 ASCII 位元組附近開始取樣
+            while block and block.isascii():
+                block = f.read(ENCODING_SAMPLE_SIZE)
+            if not block:
+                return "utf-8"
+            offset = next(i for i, b in enumerate(block) if b >= 0x80)
+            sample = block[offset:] + f.read(offset)
+            encoding = _sample_encoding(sample)
+
+    with _encoding_lock:
+        _detected_encodings.setdefault(source, encoding)
+    return encoding
+
+
+def _stream_encoding(path):
+    """
+    逐塊讀取整個檔案，同時以 TEXT_ENCODINGS 的增量解碼器驗證，回傳第一個能完整解碼的編碼
+    （只保留固定大小的讀取緩衝，不會把整個檔案載入記憶體）
+    """
+    with open(path, "rb") as f:
+        block = f.read(READ_BLOCK_SIZE)
+        if _has_utf16_bom(block):
+            return "utf-16"
+
+        decoders = {enc: codecs.getincrementaldecoder(enc)() for enc in TEXT_ENCODINGS}
+        while decoders:
+            final = len(block) < READ_BLOCK_SIZE
+            for encoding, decoder in list(decoders.items()):
+                try:
+                    decoder.decode(block, final)
+                except UnicodeDecodeError:
+                    del decoders[encoding]
+            if final:
+                break
+            block = f.read(READ_BLOCK_SIZE)
+
+    for encoding in TEXT_ENCODINGS:
+        if encoding in decoders:
+            return encoding
+    raise Exception("❌ 無法使用任何編碼讀取匯出檔")
+
+
+def forget_export_encoding(source=DEFAULT_ENCODING_SOURCE):
+    """清除記住的編碼（例如沿用的編碼在檔案後段解碼失敗時）"""
+    with _encoding_lock:
+        _detected_encodings.pop(source, None)
+
+
+def redetect_export_encoding(path, source=DEFAULT_ENCODING_SOURCE):
+    """
+    沿用或取樣判斷的編碼在檔案後段解碼失敗時使用：以整個檔案驗證重新判斷並記住
+
+    同一份樣本再判斷一次只會得到相同的錯誤編碼，因此這裡不取樣，而是驗證整個檔案
+    """
+    encoding = _stream_encoding(path)
+    with _encoding_lock:
+        _detected_encodings[source] = encoding
+    return encoding
+
+
+def _open_text(path, source=DEFAULT_ENCODING_SOURCE):
+    encoding = detect_export_encoding(path, source)
+    # utf-8-sig 可同時處理有無 BOM 的 UTF-8
+    return open(path, "r", encoding="utf-8-sig" if encoding == "utf-8" else encoding, newline="")
+
+
+def _iter_html_rows(path):
+    parser = _TableRowParser()
+    with _open_text(path) as f:
+        while True:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            parser.feed(block)
+            yield from parser.take_rows()
+    parser.close()
+    yield from parser.take_rows()
+
+
+def _iter_text_rows(path):
+    with _open_text(path) as f:
+        # 開頭的標題說明列可能只有一個儲存格（沒有分隔符號），以前幾列一起判斷
+        head = "".join(f.readline() for _ in range(DELIMITER_SAMPLE_LINES))
+        delimiter = "\t" if "\t" in head else ","
+        f.seek(0)
+        yield from csv.reader(f, delimiter=delimiter)
+
+
+def _iter_biff_rows(path):
+    try:
+        import xlrd
+    except ImportError:
+        raise Exception("❌ 讀取 BIFF 格式 .xls 需要安裝 xlrd")
+
+    # BIFF 格式需由 xlrd 整份解析，無法分段讀取
+    book = xlrd.open_workbook(path, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        for index in range(sheet.nrows):
+            yield [_biff_cell_text(xlrd, book, cell) for cell in sheet.row(index)]
+    finally:
+        book.release_resources()
+
+
+def _biff_cell_text(xlrd, book, cell):
+    """
+    依 xlrd 儲存格類型轉成與 Excel 另存 CSV 相同的文字
+
+    日期儲存格存的是序號（例如 45678.5），轉成 BIFF_DATETIME_FORMAT；整數值的浮點數不帶「.0」
+    """
+    value = cell.value
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        try:
+            return xlrd.xldate_as_datetime(value, book.datemode).strftime(BIFF_DATETIME_FORMAT)
+        except (ValueError, OverflowError, xlrd.xldate.XLDateError):
+            return str(value)
+    if cell.ctype == xlrd.XL_CELL_NUMBER:
+        return str(int(value)) if value.is_integer() else repr(value)
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return "TRUE" if value else "FALSE"
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return ""
+    return str(value)
+
+
+def _iter_xlsx_rows(path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield ["" if value is None else str(value) for value in row]
+    finally:
+        workbook.close()
+
+
+_ROW_READERS = {
+    "html": _iter_html_rows,
+    "text": _iter_text_rows,
+    "biff": _iter_biff_rows,
+    "xlsx": _iter_xlsx_rows,
+}
+
+
+def iter_export_rows(path):
+    """逐列串流讀取匯出檔，回傳每列儲存格文字 list 的 generator"""
+    return _ROW_READERS[sniff_export_format(path)](path)
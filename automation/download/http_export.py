@@ -0,0 +1,170 @@
+"""
+HTTP 匯出模式 - 登入後以瀏覽器的 cookies 直接呼叫入口網站的查詢 / 匯出 API
+"""
+
+import os
+import re
+import time
+import logging
+from datetime import datetime, timedelta
+from urllib.parse import urljoin
+import requests
+from requests.adapters import HTTPAdapter
+import config
+from .rename_query_file import convert_query_file, stage_query_file
+from .download_excel import parse_row_count
+from .slot_timer import SlotTimer, SlotTimeout, SlotResult, DEADLINE, STEP_TIMEOUT
+from utils.metrics import metrics
+
+# 匯出結果頁面中的「Download File」連結
+DOWNLOAD_LINK_PATTERN = re.compile(r'<a[^>]*href=["\']([^"\']+)["\'][^>]*>\s*Download File', re.IGNORECASE)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class PortalSessionExpired(Exception):
+    """入口網站 session 已失效，需要重新登入"""
+
+
+def session_from_driver(driver, pool_size=None):
+    """以已登入瀏覽器的 cookies 與 User-Agent 建立可重複使用連線的 requests.Session"""
+    pool_size = pool_size or config.HTTP_EXPORT_WORKERS
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.verify = config.PORTAL_VERIFY_SSL
+    session.headers["User-Agent"] = driver.execute_script("return navigator.userAgent")
+
+    for cookie in driver.get_cookies():
+        session.cookies.set(
+            cookie["name"], cookie["value"],
+            domain=cookie.get("domain"), path=cookie.get("path", "/")
+        )
+    return session
+
+
+class PortalHttpExporter:
+    """透過 HTTP 直接查詢並匯出指定時段的 Excel 檔"""
+
+    def __init__(self, session, logger=None):
+        self.session = session
+        self.logger = logger or logging.getLogger(__name__)
+
+    def _check(self, response):
+        """檢查回應，被導回登入頁或未授權時視為 session 失效"""
+        if response.status_code in (401, 403) or response.url.rstrip("/").startswith(config.LOGIN_URL):
+            response.close()
+            raise PortalSessionExpired(f"入口網站 session 已失效（HTTP {response.status_code}）")
+        response.raise_for_status()
+
+    @staticmethod
+    def _timeout(deadline, step):
+        """單一請求的逾時：config.HTTP_TIMEOUT 與時段剩餘時間預算中較小者，預算用完時拋出 SlotTimeout"""
+        if deadline is None:
+            return config.HTTP_TIMEOUT
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise SlotTimeout(step, DEADLINE)
+        return min(config.HTTP_TIMEOUT, remaining)
+
+    def _stream_to_file(self, response, dest_path, deadline=None):
+        """將回應內容串流寫入檔案（先寫入 .part，完成後再改名）；超過 deadline 時放棄並刪除 .part"""
+        part_path = dest_path + ".part"
+        size = 0
+        try:
+            with open(part_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+                        size += len(chunk)
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise SlotTimeout("download", DEADLINE)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        os.replace(part_path, dest_path)
+        return size
+
+    def count_rows(self, date, from_time, to_time):
+        """只執行查詢，回傳入口網站回報的資料筆數（找不到時回傳 None）"""
+        form = {"minDate": date, "maxDate": date, "minTime": from_time, "maxTime": to_time}
+        response = self.session.post(config.PORTAL_QUERY_URL, data=form, timeout=config.HTTP_TIMEOUT)
+        self._check(response)
+        return parse_row_count(response.text)
+
+    def export(self, date, from_time, to_time, dest_path, deadline=None):
+        """查詢並匯出指定區間，串流寫入 dest_path，回傳寫入的位元組數；deadline 為時段時間預算的截止時間（monotonic）"""
+        form = {"minDate": date, "maxDate": date, "minTime": from_time, "maxTime": to_time}
+
+        # 執行查詢
+        response = self.session.post(config.PORTAL_QUERY_URL, data=form, timeout=self._timeout(deadline, "query"))
+        self._check(response)
+
+        # 匯出 Excel：入口網站可能直接回傳檔案，或回傳含「Download File」連結的頁面
+        with self.session.post(config.PORTAL_EXPORT_URL, data=dict(form, type="excel"),
+                               timeout=self._timeout(deadline, "export"), stream=True) as response:
+            self._check(response)
+            content_type = response.headers.get("Content-Type", "")
+            if "attachment" in response.headers.get("Content-Disposition", "") or "html" not in content_type:
+                return self._stream_to_file(response, dest_path, deadline)
+
+            match = DOWNLOAD_LINK_PATTERN.search(response.text)
+            if not match:
+                raise Exception("❌ 匯出結果中找不到 Download File 連結")
+            download_url = urljoin(response.url, match.group(1))
+
+        with self.session.get(download_url, timeout=self._timeout(deadline, "download"), stream=True) as response:
+            self._check(response)
+            return self._stream_to_file(response, dest_path, deadline)
+
+
+def download_excel_http(exporter, hour, start_minute, end_minute, logger=None, download_dir=None, handoff=None):
+    """
+    HTTP 模式下載單一時段並轉成 CSV；session 失效時拋出 PortalSessionExpired 交由呼叫端重新登入
+
+    handoff 的用法與 download_excel 相同；所有請求共用時段時間預算（config.SLOT_DEADLINE）
+
+    Returns:
+        SlotResult: 成功時為 True；失敗時 status 標示逾時原因（step_timeout / deadline）或 error
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+
+    download_dir = download_dir or config.DOWNLOAD_FOLDER
+    os.makedirs(download_dir, exist_ok=True)
+
+    yesterday = datetime.today() - timedelta(days=1)
+    from_time = f"{hour:02}:{start_minute:02}:00"
+    to_time = f"{hour:02}:{end_minute:02}:59"
+    query_file = os.path.join(download_dir, f"query_{hour:02}{start_minute:02}-{hour:02}{end_minute:02}.xls")
+
+    try:
+        logger.info(f"⏱ 開始下載（HTTP）：{hour}:{start_minute:02} 到 {hour}:{end_minute:02}")
+        started = time.monotonic()
+        timer = SlotTimer()
+        size = exporter.export(yesterday.strftime("%Y-%m-%d"), from_time, to_time, query_file,
+                               deadline=timer.deadline)
+        logger.info(f"📥 匯出完成：{os.path.basename(query_file)}（{size} bytes）")
+
+        date = yesterday.strftime("%Y%m%d")
+        staged = stage_query_file(query_file, date, hour, start_minute, end_minute,
+                                  seconds=time.monotonic() - started)
+        if handoff:
+            handoff((hour, start_minute, end_minute), date, staged)
+        else:
+            convert_query_file(staged, date, hour, start_minute, end_minute, logger)
+        return SlotResult(seconds=time.monotonic() - started)
+
+    except PortalSessionExpired:
+        raise
+    except Exception as e:
+        if isinstance(e, requests.Timeout):
+            result = SlotResult(STEP_TIMEOUT, "http", str(e), time.monotonic() - started)
+        else:
+            result = SlotResult.from_exception(e, time.monotonic() - started)
+        logger.error(f"❌ 下載流程錯誤（HTTP，{result.status}）: {str(e)}")
+        metrics.inc("rpa_slot_failures_total", reason=result.status)
+        return result
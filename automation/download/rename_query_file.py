@@ -1,73 +1,166 @@
 import os
+import csv
 import time
 import glob
+from itertools import islice
 import config
 import pandas as pd
-import win32com.client
 from datetime import datetime
+from .export_reader import iter_export_rows, detect_export_encoding, redetect_export_encoding
+from utils.run_manifest import run_manifest
+from utils.metrics import metrics
 
-def convert_xls_to_csv_trimmed(xls_file, output_csv_file, logger=None):
-    """
-    將 .xls 檔案轉換為指定格式的 .csv 並刪除前 6 列，調整欄位格式
-    """
-    try:
-        excel = win32com.client.Dispatch("Excel.Application")
-        excel.Visible = False
-        excel.DisplayAlerts = False
+try:
+    import win32com.client
+except ImportError:  # 非 Windows 主機沒有 Excel COM，只能使用 Python 轉換
+    win32com = None
 
-        if logger:
-            logger.info("✅ Excel COM 物件建立成功")
-        else:
-            print("✅ Excel COM 物件建立成功")
+# 匯出檔前 6 列為標題說明，之後才是資料
+HEADER_ROWS = 6
 
-        wb = excel.Workbooks.Open(xls_file)
-        temp_csv = xls_file.replace('.xls', '_temp.csv')
-        wb.SaveAs(temp_csv, FileFormat=6, Local=True)
-        wb.Close(False)
+# 匯出檔原始欄位
+SOURCE_COLUMNS = [
+    "Index", "User", "Group Name", "Host IP", "Target IP",
+    "App Type", "Specific applications", "Time", "Action/Result"
+]
+
+# 輸出 CSV 欄位 -> 對應的原始欄位（None 表示留空）
+OUTPUT_COLUMNS = {
+    "Time": "Time",
+    "Src. IP": "User",
+    "Src. Port": None,
+    "Dst. IP": "Target IP",
+    "Dst. Port": None,
+    "User": "User",
+    "Show Name": "Host IP",
+    "User Group": "Group Name",
+    "URL": None,
+    "Title": None,
+    "Domain Cate.": "Specific applications",
+    "Action": "Action/Result",
+    "Src. Location": None,
+}
+
+_SOURCE_INDEX = {name: i for i, name in enumerate(SOURCE_COLUMNS)}
+_OUTPUT_SOURCES = [_SOURCE_INDEX[src] if src else None for src in OUTPUT_COLUMNS.values()]
+
+# 轉換時實際需要讀取的原始欄位索引（其餘欄位不會被讀入）
+USED_SOURCE_INDEXES = sorted({i for i in _OUTPUT_SOURCES if i is not None})
+
+
+def _log(logger, message, level="info"):
+    if logger:
+        getattr(logger, level)(message)
+    else:
+        print(message)
+
+
+def map_export_row(row):
+    """將一列原始資料轉成輸出 CSV 的 13 個欄位（欄位不足時補空字串）"""
+    width = len(row)
+    return ["" if index is None or index >= width else row[index] for index in _OUTPUT_SOURCES]
 
-        df = None
-        encodings = ['utf-8', 'big5', 'gbk', 'cp950', 'latin1']
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(temp_csv, header=None, encoding=encoding)
-                if logger:
-                    logger.info(f"使用編碼：{encoding}")
-                else:
-                    print(f"使用編碼：{encoding}")
+
+def _write_export_rows(xls_file, output_csv_file):
+    """串流讀取匯出檔並分批寫入輸出 CSV，回傳資料筆數"""
+    rows = islice(iter_export_rows(xls_file), HEADER_ROWS, None)
+    count = 0
+    with open(output_csv_file, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(OUTPUT_COLUMNS.keys())
+        while True:
+            chunk = [map_export_row(row) for row in islice(rows, config.CONVERT_CHUNK_SIZE)]
+            if not chunk:
                 break
-            except UnicodeDecodeError:
-                continue
+            writer.writerows(chunk)
+            count += len(chunk)
+    return count
+
+
+def convert_xls_to_csv_native(xls_file, output_csv_file, logger=None):
+    """
+    以純 Python 串流讀取 .xls 匯出檔，每 config.CONVERT_CHUNK_SIZE 列轉換一次並附加寫入 .csv
+    （不需 Excel、不產生暫存檔，記憶體用量與檔案大小無關）
+    """
+    try:
+        try:
+            count = _write_export_rows(xls_file, output_csv_file)
+        except UnicodeDecodeError:
+            # 沿用或取樣判斷的編碼不適用此檔案（例如入口網站改了編碼），以整個檔案重新判斷後再試一次
+            _log(logger, "⚠️ 沿用的編碼無法解碼，以整個檔案重新判斷編碼", "warning")
+            metrics.inc("rpa_retries_total", kind="encoding")
+            redetect_export_encoding(xls_file)
+            count = _write_export_rows(xls_file, output_csv_file)
 
-        if df is None:
-            raise Exception("❌ 無法使用任何編碼讀取 CSV 檔案")
+        metrics.inc("rpa_rows_total", count)
+        _log(logger, f"✅ 轉換完成：{os.path.basename(output_csv_file)}（{count} 筆）")
+        return True
 
-        # 移除前 6 行
-        df_trimmed = df.iloc[6:].reset_index(drop=True)
+    except Exception as e:
+        _log(logger, f"❌ 轉換失敗（Python）：{e}", "error")
+        if os.path.exists(output_csv_file):
+            os.remove(output_csv_file)
+        return False
 
+
+def _write_csv_chunks(temp_csv, output_csv_file, encoding):
+    """分段讀取 Excel 另存的 CSV，只讀需要的欄位，逐段轉換後附加寫入輸出檔，回傳資料筆數"""
+    chunks = pd.read_csv(
+        temp_csv, header=None, encoding=encoding, dtype=str, keep_default_na=False,
+        skiprows=HEADER_ROWS, usecols=USED_SOURCE_INDEXES, chunksize=config.CONVERT_CHUNK_SIZE
+    )
+    header = True
+    count = 0
+    for chunk in chunks:
+        count += len(chunk)
         # 指定原始欄位名稱
-        df_trimmed.columns = [
-            "Index", "User", "Group Name", "Host IP", "Target IP",
-            "App Type", "Specific applications", "Time", "Action/Result"
-        ]
+        chunk.columns = [SOURCE_COLUMNS[i] for i in USED_SOURCE_INDEXES]
 
         # 轉換為指定格式的新表格
         df_final = pd.DataFrame({
-            "Time": df_trimmed["Time"],
-            "Src. IP": df_trimmed["User"],
-            "Src. Port": "",
-            "Dst. IP": df_trimmed["Target IP"],
-            "Dst. Port": "",
-            "User": df_trimmed["User"],
-            "Show Name": df_trimmed["Host IP"],
-            "User Group": df_trimmed["Group Name"],
-            "URL": "",
-            "Title": "",
-            "Domain Cate.": df_trimmed["Specific applications"],
-            "Action": df_trimmed["Action/Result"],
-            "Src. Location": ""
+            name: chunk[src] if src else ""
+            for name, src in OUTPUT_COLUMNS.items()
         })
+        df_final.to_csv(output_csv_file, index=False, encoding='utf-8-sig' if header else 'utf-8',
+                        mode='w' if header else 'a', header=header)
+        header = False
+
+    if header:
+        # 沒有任何資料列時仍輸出欄位名稱
+        pd.DataFrame(columns=list(OUTPUT_COLUMNS)).to_csv(output_csv_file, index=False, encoding='utf-8-sig')
+    return count
 
-        df_final.to_csv(output_csv_file, index=False, encoding='utf-8-sig')
+
+def convert_xls_to_csv_com(xls_file, output_csv_file, logger=None):
+    """
+    以 Excel COM 將 .xls 檔案轉換為指定格式的 .csv 並刪除前 6 列，調整欄位格式（僅限 Windows）
+    """
+    if win32com is None:
+        _log(logger, "❌ 轉換失敗：此主機沒有 Excel COM（pywin32）", "error")
+        return False
+
+    try:
+        excel = win32com.client.Dispatch("Excel.Application")
+        excel.Visible = False
+        excel.DisplayAlerts = False
+
+        _log(logger, "✅ Excel COM 物件建立成功")
+
+        wb = excel.Workbooks.Open(xls_file)
+        temp_csv = xls_file.replace('.xls', '_temp.csv')
+        wb.SaveAs(temp_csv, FileFormat=6, Local=True)
+        wb.Close(False)
+
+        # Excel 另存的 CSV 使用系統編碼，同一台主機每次都相同，判斷一次後沿用
+        encoding = detect_export_encoding(temp_csv, source="excel-csv")
+        try:
+            count = _write_csv_chunks(temp_csv, output_csv_file, encoding)
+        except UnicodeDecodeError:
+            metrics.inc("rpa_retries_total", kind="encoding")
+            encoding = redetect_export_encoding(temp_csv, source="excel-csv")
+            count = _write_csv_chunks(temp_csv, output_csv_file, encoding)
+        metrics.inc("rpa_rows_total", count)
+        _log(logger, f"使用編碼：{encoding}")
 
         if os.path.exists(temp_csv):
             os.remove(temp_csv)
@@ -76,46 +169,62 @@ def convert_xls_to_csv_trimmed(xls_file, output_csv_file, logger=None):
         except:
             pass
 
-        if logger:
-            logger.info(f"✅ 轉換完成：{os.path.basename(output_csv_file)}")
-        else:
-            print(f"✅ 轉換完成：{os.path.basename(output_csv_file)}")
+        _log(logger, f"✅ 轉換完成：{os.path.basename(output_csv_file)}")
 
         return True
 
     except Exception as e:
-        if logger:
-            logger.error(f"❌ 轉換失敗：{e}")
-        else:
-            print(f"❌ 轉換失敗：{e}")
-        
+        _log(logger, f"❌ 轉換失敗：{e}", "error")
+
         # 清理 Excel 程序
         try:
             if 'excel' in locals():
                 excel.Quit()
         except:
             pass
-        
+
         return False
 
-def rename_query_file(driver, date, hour, start_minute, end_minute, logger=None):
+
+def convert_xls_to_csv_trimmed(xls_file, output_csv_file, logger=None):
     """
-    從下載資料夾中尋找 query*.xls 檔，轉成新格式 CSV 並命名
+    將 .xls 檔案轉換為指定格式的 .csv 並刪除前 6 列，調整欄位格式
+
+    依 config.CONVERTER_BACKEND 選擇轉換方式：
+    "native" 只用 Python、"com" 只用 Excel COM、
+    "auto" 先用 Python，失敗且主機有 Excel COM 時改用 COM
+    """
+    backend = config.CONVERTER_BACKEND
+    if backend == "com":
+        return convert_xls_to_csv_com(xls_file, output_csv_file, logger)
+
+    if convert_xls_to_csv_native(xls_file, output_csv_file, logger):
+        return True
+
+    if backend == "auto" and win32com is not None:
+        _log(logger, "🔄 改用 Excel COM 轉換", "warning")
+        return convert_xls_to_csv_com(xls_file, output_csv_file, logger)
+    return False
+
+def wait_for_query_file(download_dir=None, downloaded_file=None, logger=None, timeout=60):
+    """
+    取得下載完成的 query*.xls 檔案路徑
+
+    已知下載檔案路徑（DevTools 下載追蹤、HTTP 匯出模式）時直接使用，
+    否則輪詢下載資料夾最多 timeout 秒
     """
-    download_dir = config.DOWNLOAD_FOLDER
+    download_dir = download_dir or config.DOWNLOAD_FOLDER
     print(f"🔍 下載資料夾路徑: {download_dir}")
 
-    matched_file = None
-    wait_time = 0
-    while wait_time < 60:
+    matched_file = downloaded_file if downloaded_file and os.path.exists(downloaded_file) else None
+    start_time = time.monotonic()
+    while not matched_file and time.monotonic() - start_time < timeout:
         candidates = glob.glob(os.path.join(download_dir, "query*.xls"))
         valid_files = [f for f in candidates if not f.endswith(".crdownload")]
-        print(f"⏱️ 嘗試第 {wait_time+1} 秒, 找到檔案：{valid_files}")
         if valid_files:
             matched_file = max(valid_files, key=os.path.getctime)
             break
-        time.sleep(1)
-        wait_time += 1
+        time.sleep(config.DOWNLOAD_POLL_INTERVAL)
 
     if not matched_file:
         error_msg = "❌ 找不到有效的 query.xls 檔案或下載超時"
@@ -123,13 +232,20 @@ def rename_query_file(driver, date, hour, start_minute, end_minute, logger=None)
             logger.error(error_msg)
         raise FileNotFoundError(error_msg)
 
+    return matched_file
+
+def convert_query_file(matched_file, date, hour, start_minute, end_minute, logger=None):
+    """將下載的 .xls 轉成新格式 CSV，命名為 logger_urlLog_<date>_<HHMM>-<HHMM>.csv 並輸出到 config.DOWNLOAD_FOLDER"""
     start_str = f"{hour:02}{start_minute:02}"
     end_str = f"{hour:02}{end_minute:02}"
     new_filename = f"logger_urlLog_{date}_{start_str}-{end_str}.csv"
-    new_path = os.path.join(download_dir, new_filename)
+    new_path = os.path.join(config.DOWNLOAD_FOLDER, new_filename)
 
+    slot = (hour, start_minute, end_minute)
+    started = time.monotonic()
     try:
         if convert_xls_to_csv_trimmed(matched_file, new_path, logger):
+            run_manifest.mark(date, slot, "convert", new_path, seconds=time.monotonic() - started)
             os.remove(matched_file)
             success_msg = f"✅ 檔案轉換並重新命名為：{new_filename}"
         else:
@@ -142,6 +258,7 @@ def rename_query_file(driver, date, hour, start_minute, end_minute, logger=None)
         error_msg = f"❌ 檔案處理失敗: {e}"
         if logger:
             logger.error(error_msg)
+        run_manifest.mark(date, slot, "convert", ok=False, error=str(e), seconds=time.monotonic() - started)
         raise
 
     if logger:
@@ -149,4 +266,28 @@ def rename_query_file(driver, date, hour, start_minute, end_minute, logger=None)
     else:
         print(success_msg)
 
-    return new_path
\ No newline at end of file
+    return new_path
+
+def stage_query_file(matched_file, date, hour, start_minute, end_minute, seconds=None):
+    """
+    將下載的 .xls 改名為該時段專用的暫存檔（raw_<date>_<HHMM>-<HHMM>.xls），
+    讓下一個時段的下載不會與等待轉換的檔案混淆，並在執行清單記錄下載完成、checksum 與下載耗時
+    """
+    staged = os.path.join(os.path.dirname(matched_file),
+                          f"raw_{date}_{hour:02}{start_minute:02}-{hour:02}{end_minute:02}.xls")
+    os.replace(matched_file, staged)
+    run_manifest.mark(date, (hour, start_minute, end_minute), "download", staged, seconds=seconds)
+    return staged
+
+def rename_query_file(driver, date, hour, start_minute, end_minute, logger=None, download_dir=None,
+                      downloaded_file=None):
+    """
+    從下載資料夾中尋找 query*.xls 檔，轉成新格式 CSV 並命名
+
+    download_dir 為瀏覽器實際的下載資料夾（平行模式下每個 worker 各自一個），
+    轉換後的 CSV 一律輸出到 config.DOWNLOAD_FOLDER；
+    若已知下載檔案路徑（例如 HTTP 匯出模式），可傳入 downloaded_file 略過資料夾輪詢
+    """
+    matched_file = wait_for_query_file(download_dir, downloaded_file, logger)
+    staged = stage_query_file(matched_file, date, hour, start_minute, end_minute)
+    return convert_query_file(staged, date, hour, start_minute, end_minute, logger)
@@ -0,0 +1,101 @@
+"""
+時段規劃 - 依入口網站回報的資料筆數合併冷門時段、拆分熱門時段
+
+時段沿用 (hour, start_minute, end_minute) 格式（同一小時內，結束分鐘包含在內），
+因此輸出檔名仍為 logger_urlLog_<date>_<HHMM>-<HHMM>.csv
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+import config
+
+
+def _split_limit():
+    """單一時段可接受的最大筆數（接近匯出上限時拆分）"""
+    return int(config.EXPORT_ROW_LIMIT * config.PLANNER_SPLIT_RATIO)
+
+
+def _split_slot(slot, rows, count_rows, logger):
+    """筆數接近匯出上限時將時段對半拆分，直到筆數足夠小或只剩 1 分鐘"""
+    hour, start_minute, end_minute = slot
+    if rows is None or rows <= _split_limit():
+        return [slot]
+    if start_minute == end_minute:
+        logger.warning(f"⚠️ {hour}:{start_minute:02} 單一分鐘仍有 {rows} 筆，匯出可能被截斷")
+        return [slot]
+
+    middle = (start_minute + end_minute) // 2
+    left, right = (hour, start_minute, middle), (hour, middle + 1, end_minute)
+    left_rows = count_rows(left)
+    # 時段互不重疊，右半部的筆數可由總數推得
+    right_rows = rows - left_rows if left_rows is not None else count_rows(right)
+    return (_split_slot(left, left_rows, count_rows, logger)
+            + _split_slot(right, right_rows, count_rows, logger))
+
+
+def _merge_slots(counted):
+    """依序合併相鄰時段，合併後筆數不超過 config.PLANNER_MERGE_ROWS"""
+    merged = []
+    current, current_rows = None, 0
+    for slot, rows in counted:
+        if (current is not None and rows is not None and current_rows is not None
+                and current_rows + rows <= config.PLANNER_MERGE_ROWS):
+            current = (current[0], current[1], slot[2])
+            current_rows += rows
+            continue
+        if current is not None:
+            merged.append((current, current_rows))
+        current, current_rows = slot, rows
+    if current is not None:
+        merged.append((current, current_rows))
+    return merged
+
+
+def _plan_hour(hour, slots, count_rows, logger):
+    """規劃同一小時內的時段"""
+    whole_hour = (hour, slots[0][1], slots[-1][2])
+
+    # 整個小時筆數很少：一次匯出
+    hour_rows = count_rows(whole_hour)
+    if hour_rows is None:
+        return slots
+    if hour_rows <= config.PLANNER_MERGE_ROWS:
+        return [whole_hour]
+
+    # 否則逐一取得各時段筆數，冷門時段合併、熱門時段拆分
+    planned = []
+    counted = [(slot, count_rows(slot)) for slot in slots]
+    for slot, rows in _merge_slots(counted):
+        planned.extend(_split_slot(slot, rows, count_rows, logger))
+    return planned
+
+
+def plan_time_slots(base_slots, count_rows, logger=None, parallelism=1):
+    """
+    依資料筆數重新規劃下載時段
+
+    Args:
+        base_slots (list): 固定間隔的時段 [(hour, start_minute, end_minute), ...]
+        count_rows (callable): count_rows(slot) 回傳該時段的資料筆數，無法取得時回傳 None
+        logger: 日誌
+        parallelism (int): 同時規劃的小時數（各小時互不相關）；大於 1 時 count_rows 需可同時呼叫
+
+    Returns:
+        list: 規劃後的時段；無法取得筆數的小時維持原本的時段
+    """
+    logger = logger or logging.getLogger(__name__)
+    hours = [(hour, list(group)) for hour, group in groupby(sorted(base_slots), key=lambda slot: slot[0])]
+
+    def plan(item):
+        return _plan_hour(*item, count_rows, logger)
+
+    if parallelism > 1 and len(hours) > 1:
+        with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="slot-planner") as executor:
+            results = list(executor.map(plan, hours))
+    else:
+        results = [plan(item) for item in hours]
+    planned = [slot for hour_slots in results for slot in hour_slots]
+
+    logger.info(f"🗓 時段規劃完成：{len(base_slots)} 個固定時段 → {len(planned)} 個匯出時段")
+    return planned
@@ -0,0 +1,131 @@
+"""
+時段步驟計時 - 以條件等待取代固定 sleep，記錄每個步驟實際等待的時間；
+所有等待共用同一個時段時間預算（config.SLOT_DEADLINE），逾時依原因分類
+"""
+
+import time
+from contextlib import contextmanager
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+import config
+from utils.metrics import metrics
+
+# 時段處理結果的分類
+OK = "ok"
+STEP_TIMEOUT = "step_timeout"  # 單一步驟超過 config.STEP_TIMEOUTS 的上限
+DEADLINE = "deadline"          # 時段的時間預算已用完
+ERROR = "error"                # 其他錯誤
+
+
+class SlotTimeout(Exception):
+    """時段步驟等待逾時，kind 為 STEP_TIMEOUT 或 DEADLINE"""
+
+    def __init__(self, step, kind):
+        self.step = step
+        self.kind = kind
+        reason = "時段時間預算已用完" if kind == DEADLINE else "步驟等待逾時"
+        super().__init__(f"{reason}：{step}")
+
+
+class SlotResult:
+    """
+    單一時段的處理結果，可直接當成 bool 使用（成功為 True）
+
+    status 為 OK、STEP_TIMEOUT、DEADLINE 或 ERROR；step 為逾時的步驟
+    """
+
+    def __init__(self, status=OK, step=None, error=None, seconds=0.0):
+        self.status = status
+        self.step = step
+        self.error = error
+        self.seconds = seconds
+
+    @classmethod
+    def from_exception(cls, error, seconds=0.0):
+        """依例外分類失敗原因"""
+        if isinstance(error, SlotTimeout):
+            return cls(error.kind, error.step, str(error), seconds)
+        return cls(ERROR, error=str(error), seconds=seconds)
+
+    def __bool__(self):
+        return self.status == OK
+
+    def __repr__(self):
+        step = f", step={self.step}" if self.step else ""
+        return f"SlotResult({self.status}{step}, {self.seconds:.2f}s)"
+
+# 頁面上的 AJAX 請求（若有 jQuery）都已完成且文件載入完畢
+AJAX_IDLE_SCRIPT = """
+    return document.readyState === 'complete'
+        && (!window.jQuery || window.jQuery.active === 0);
+"""
+
+
+def ajax_idle(driver):
+    """WebDriverWait 條件：頁面已載入完成且沒有進行中的 AJAX 請求"""
+    return driver.execute_script(AJAX_IDLE_SCRIPT)
+
+
+class SlotTimer:
+    """
+    記錄單一時段每個步驟的等待時間
+
+    每個步驟的等待上限為 config.STEP_TIMEOUTS 與時段剩餘時間預算中較小者，
+    時段卡住時最多經過 config.SLOT_DEADLINE 秒即放棄
+    """
+
+    def __init__(self, deadline=None):
+        budget = config.SLOT_DEADLINE if deadline is None else deadline
+        self.deadline = time.monotonic() + budget if budget else None
+        self.steps = []  # [(步驟名稱, 耗時秒數)]
+
+    @property
+    def remaining(self):
+        """時段剩餘的時間預算（秒），未設定預算時為 None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def timeout_for(self, name):
+        """取得步驟的等待上限（秒）：步驟設定與剩餘時間預算中較小者"""
+        limit = config.STEP_TIMEOUTS.get(name, config.STEP_TIMEOUT_DEFAULT)
+        remaining = self.remaining
+        return limit if remaining is None else min(limit, remaining)
+
+    def timeout(self, name):
+        """步驟 name 逾時的例外：剩餘時間預算已用完為 DEADLINE，否則為 STEP_TIMEOUT"""
+        # 等待上限被時間預算截短時，逾時的當下預算必定已用完
+        remaining = self.remaining
+        kind = DEADLINE if remaining is not None and remaining <= 0.01 else STEP_TIMEOUT
+        return SlotTimeout(name, kind)
+
+    @contextmanager
+    def step(self, name):
+        """記錄區塊內的耗時（同時記入執行指標 rpa_phase_seconds）"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            seconds = time.monotonic() - start
+            self.steps.append((name, seconds))
+            metrics.observe("rpa_phase_seconds", seconds, phase=name)
+
+    def wait(self, driver, name, condition, timeout=None):
+        """等待條件成立並記錄耗時，回傳條件的結果；逾時拋出 SlotTimeout"""
+        with self.step(name):
+            limit = timeout or self.timeout_for(name)
+            if limit <= 0:
+                raise self.timeout(name)
+            try:
+                return WebDriverWait(driver, limit).until(condition)
+            except TimeoutException:
+                raise self.timeout(name) from None
+
+    @property
+    def total(self):
+        """所有步驟的總耗時"""
+        return sum(seconds for _, seconds in self.steps)
+
+    def summary(self):
+        """格式化的步驟耗時，例如「menu 0.42s, iframe 0.10s」"""
+        return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.steps)
@@ -1,49 +1,18 @@
-import os
-from datetime import datetime, timedelta
 import requests
 import config
+from utils.execution_logger import execution_logger
 
-def generate_expected_filenames() -> list[str]:
-    filenames = []
-    yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y%m%d")
-    for hour in range(8, 18):
-        for i in range(6):
-            start_min = i * 10
-            end_min = start_min + 9
-            start_str = f"{hour:02d}{start_min:02d}"
-            end_str = f"{hour:02d}{end_min:02d}"
-            interval = f"{start_str}-{end_str}"
-            filename = f"logger_urlLog_{yesterday}_{interval}.csv"
-            filenames.append(filename)
-    return filenames
+def generate_expected_filenames(slots=None) -> list[str]:
+    """產生預期的檔案名稱列表；slots 為實際規劃的時段 (hour, start_minute, end_minute)，None 則使用本次執行的時段"""
+    return execution_logger.generate_expected_filenames(slots)
 
-def check_download_files() -> str:
+def check_download_files(slots=None) -> str:
     """
     檢查昨天所有應該下載的檔案是否存在，並回傳格式化文字（含統計）
-    """
-    download_folder = config.DOWNLOAD_FOLDER
-    expected_files = generate_expected_filenames()
-
-    log_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-    lines = [f"{log_date} AI上網統計紀錄：\n"]
-
-    success_count = 0
-    fail_count = 0
 
-    for filename in expected_files:
-        full_path = os.path.join(download_folder, filename)
-        interval = filename.replace(".csv", "")
-        exists = os.path.exists(full_path)
-        status = "✅" if exists else "❌"
-        lines.append(f"{interval}-{status}")
-        if exists:
-            success_count += 1
-        else:
-            fail_count += 1
-
-    lines.append("")  # 空行
-    lines.append(f"✅ 成功：{success_count}，❌ 失敗：{fail_count}")
-    return "\n".join(lines)
+    與執行摘要共用 execution_logger：本次執行有帳本時直接查詢，否則掃描一次下載資料夾
+    """
+    return execution_logger.get_summary_text(slots)
 
 def notify_teams_result(message_text: str) -> None:
     """
@@ -60,9 +29,9 @@ def notify_teams_result(message_text: str) -> None:
     except Exception as e:
         print(f"❌ 發送發生錯誤：{e}")
 
-def report_download_status():
+def report_download_status(slots=None):
     """
     主入口：檢查下載檔案 → 發送執行結果
     """
-    message = check_download_files()
+    message = check_download_files(slots)
     notify_teams_result(message)
\ No newline at end of file
@@ -0,0 +1,9 @@
+"""
+Pipeline 模組 - 下載、轉換、上傳階段管線
+"""
+
+from .slot_pipeline import SlotPipeline
+
+__all__ = [
+    "SlotPipeline"
+]
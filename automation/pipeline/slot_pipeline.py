@@ -0,0 +1,131 @@
+"""
+時段管線 - 下載 → 轉換 → 上傳 三個階段以有上限的佇列串接，各時段完成一個階段就立即進入下一個
+"""
+
+import os
+import queue
+import threading
+import time
+import config
+from utils.logger import setup_logging
+from utils.run_manifest import run_manifest
+from ..download.rename_query_file import convert_query_file
+from ..upload.upload_sharepoint import (
+    create_graph_session, get_graph_token, upload_file, log_summary, list_remote_items, is_unchanged
+)
+
+# 通知階段執行緒結束的標記
+_STOP = object()
+
+
+class SlotPipeline:
+    """
+    下載之後的轉換與上傳階段
+
+    下載端（BrowserPool / HttpExportPool）以 handoff(slot, date, raw_file) 交出檔案，
+    佇列滿時 handoff 會等待，避免下載遠快於轉換 / 上傳時堆積過多檔案
+    """
+
+    def __init__(self, logger=None, queue_size=None, convert_workers=None, upload_workers=None):
+        self.logger = logger or setup_logging("管線")
+        self.upload_logger = setup_logging("上傳到 SharePoint")
+        self.queue_size = queue_size or config.PIPELINE_QUEUE_SIZE
+        self.convert_workers = convert_workers or config.PIPELINE_CONVERT_WORKERS
+        self.upload_workers = upload_workers or config.UPLOAD_MAX_WORKERS
+        self._convert_queue = queue.Queue(maxsize=self.queue_size)
+        self._upload_queue = queue.Queue(maxsize=self.queue_size)
+        self._convert_threads = []
+        self._upload_threads = []
+        self._session = None
+        self._remote_items = None
+        self._lock = threading.Lock()
+        self.results = {"converted": 0, "convert_failed": 0, "success": 0, "failed": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.results[key] += 1
+
+    def start(self):
+        """啟動轉換與上傳階段的執行緒"""
+        self._session = create_graph_session(self.upload_workers)
+        if config.UPLOAD_SKIP_UNCHANGED:
+            try:
+                self._remote_items = list_remote_items(get_graph_token(), self.upload_logger, self._session)
+            except Exception as e:
+                self.upload_logger.warning(f"⚠️ 存取權杖取得失敗，無法比對遠端檔案: {e}")
+        self._convert_threads = [
+            threading.Thread(target=self._convert_loop, name=f"convert-{i + 1}", daemon=True)
+            for i in range(self.convert_workers)
+        ]
+        self._upload_threads = [
+            threading.Thread(target=self._upload_loop, name=f"upload-{i + 1}", daemon=True)
+            for i in range(self.upload_workers)
+        ]
+        for t in self._convert_threads + self._upload_threads:
+            t.start()
+        self.logger.info(f"✓ 管線啟動：轉換 {self.convert_workers} 個、上傳 {self.upload_workers} 個執行緒")
+        return self
+
+    def handoff(self, slot, date, raw_file):
+        """下載階段交出檔案（佇列滿時等待）"""
+        self._convert_queue.put((slot, date, raw_file))
+
+    def resume_upload(self, csv_path):
+        """上次執行已轉換完成、尚未上傳的 CSV 直接進入上傳階段"""
+        self._upload_queue.put(csv_path)
+
+    def _convert_loop(self):
+        while True:
+            item = self._convert_queue.get()
+            if item is _STOP:
+                return
+            (hour, start_minute, end_minute), date, raw_file = item
+            try:
+                csv_path = convert_query_file(raw_file, date, hour, start_minute, end_minute, self.logger)
+                self._count("converted")
+                self._upload_queue.put(csv_path)
+            except Exception as e:
+                self.logger.error(f"❌ 時段 {hour}:{start_minute:02} ~ {hour}:{end_minute:02} 轉換失敗: {e}")
+                self._count("convert_failed")
+
+    def _upload_loop(self):
+        while True:
+            path = self._upload_queue.get()
+            if path is _STOP:
+                return
+            name = os.path.basename(path)
+            started = time.monotonic()
+            try:
+                if is_unchanged(path, name, self._remote_items):
+                    self.upload_logger.info(f"⏭ 內容未變更，略過: {name}")
+                    ok = True
+                else:
+                    self.upload_logger.info(f"📤 正在上傳: {name}")
+                    ok = upload_file(path, name, get_graph_token(), self.upload_logger, self._session)
+            except Exception as e:
+                self.upload_logger.error(f"❌ 上傳失敗 {name}: {e}")
+                ok = False
+            run_manifest.mark_uploaded(path, ok, seconds=time.monotonic() - started)
+            self._count("success" if ok else "failed")
+
+    def finish(self):
+        """等待已交出的檔案全部轉換、上傳完畢，回傳與 upload_temp_files_to_sharepoint 相同格式的上傳結果"""
+        for _ in self._convert_threads:
+            self._convert_queue.put(_STOP)
+        for t in self._convert_threads:
+            t.join()
+        for _ in self._upload_threads:
+            self._upload_queue.put(_STOP)
+        for t in self._upload_threads:
+            t.join()
+        if self._session:
+            self._session.close()
+
+        log_summary(self.upload_logger, self.results["success"], self.results["failed"])
+        if self.results["convert_failed"]:
+            self.logger.warning(f"⚠️ {self.results['convert_failed']} 個時段轉換失敗")
+        return {
+            "success": self.results["success"],
+            "failed": self.results["failed"],
+            "total": self.results["success"] + self.results["failed"],
+        }
@@ -2,8 +2,16 @@
 Upload 模組 - SharePoint 上傳功能
 """
 
-from .upload_sharepoint import upload_temp_files_to_sharepoint
+from .upload_sharepoint import upload_temp_files_to_sharepoint, upload_files, create_graph_session, list_remote_items
+from .graph_token import GraphTokenProvider, graph_token_provider
+from .content_hash import file_hashes
 
 __all__ = [
-    "upload_temp_files_to_sharepoint"
+    "upload_temp_files_to_sharepoint",
+    "upload_files",
+    "create_graph_session",
+    "list_remote_items",
+    "file_hashes",
+    "GraphTokenProvider",
+    "graph_token_provider"
 ] 
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+檔案內容雜湊 - 與 Graph API 在 driveItem.file.hashes 回報的 quickXorHash / sha1Hash 相同的算法
+"""
+
+import base64
+import hashlib
+
+# quickXorHash：160 位元的循環暫存器，第 k 個位元組 XOR 到第 (k * 11) mod 160 個位元
+QUICKXOR_WIDTH = 160
+QUICKXOR_SHIFT = 11
+QUICKXOR_MASK = (1 << QUICKXOR_WIDTH) - 1
+
+# 每次讀取的大小需為 160 的倍數，讓每個區塊的位置與檔案中的位置對齊
+HASH_BLOCK_SIZE = QUICKXOR_WIDTH * 6400
+
+
+def _fold_quickxor(columns):
+    """將「位置 mod 160」相同的位元組 XOR 結果依位移放入 160 位元暫存器"""
+    register = 0
+    for index, value in enumerate(columns):
+        if value:
+            shifted = value << (index * QUICKXOR_SHIFT % QUICKXOR_WIDTH)
+            register ^= (shifted & QUICKXOR_MASK) ^ (shifted >> QUICKXOR_WIDTH)
+    return register
+
+
+def file_hashes(path):
+    """
+    一次讀取檔案同時計算 quickXorHash 與 sha1
+
+    Returns:
+        dict: {"quickXorHash": base64 字串, "sha1Hash": 大寫十六進位字串}
+    """
+    sha1 = hashlib.sha1()
+    # 以整數一次 XOR 160 個位元組：columns 的第 i 個位元組 = 所有位置 mod 160 == i 的位元組 XOR
+    columns = 0
+    length = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            sha1.update(block)
+            length += len(block)
+            for start in range(0, len(block), QUICKXOR_WIDTH):
+                columns ^= int.from_bytes(block[start:start + QUICKXOR_WIDTH], "little")
+
+    register = _fold_quickxor(columns.to_bytes(QUICKXOR_WIDTH, "little"))
+    digest = bytearray(register.to_bytes(QUICKXOR_WIDTH // 8, "little"))
+    # 最後 8 個位元組再 XOR 檔案長度
+    for i, byte in enumerate(length.to_bytes(8, "little")):
+        digest[-8 + i] ^= byte
+
+    return {
+        "quickXorHash": base64.b64encode(bytes(digest)).decode("ascii"),
+        "sha1Hash": sha1.hexdigest().upper(),
+    }
+
+
+def matches_remote(local_hashes, size, remote):
+    """
+    本機檔案是否與遠端項目內容相同
+
+    remote 為 Graph API driveItem 的 {"size": ..., "file": {"hashes": {...}}}；
+    商務版 OneDrive / SharePoint 只回報 quickXorHash，個人版另有 sha1Hash
+    """
+    if not remote or remote.get("size") != size:
+        return False
+    hashes = (remote.get("file") or {}).get("hashes") or {}
+    if hashes.get("quickXorHash"):
+        return hashes["quickXorHash"] == local_hashes["quickXorHash"]
+    if hashes.get("sha1Hash"):
+        return hashes["sha1Hash"].upper() == local_hashes["sha1Hash"]
+    return False
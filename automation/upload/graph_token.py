@@ -0,0 +1,106 @@
+"""
+Graph API 存取權杖快取 - 記住權杖與到期時間，到期前才重新取得
+"""
+
+import json
+import os
+import threading
+import time
+import requests
+import config
+from utils.metrics import metrics
+
+
+class GraphTokenProvider:
+    """
+    Graph API 存取權杖提供者
+
+    權杖與到期時間保存在記憶體，並可選擇寫入 config.GRAPH_TOKEN_CACHE_FILE 供下次執行沿用；
+    在到期前 config.GRAPH_TOKEN_REFRESH_MARGIN 秒內才重新取得，可同時被多個上傳執行緒呼叫
+    """
+
+    def __init__(self, cache_file=None, refresh_margin=None):
+        self.cache_file = cache_file if cache_file is not None else config.GRAPH_TOKEN_CACHE_FILE
+        self.refresh_margin = refresh_margin if refresh_margin is not None else config.GRAPH_TOKEN_REFRESH_MARGIN
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def _valid(self):
+        return self._token is not None and time.time() < self._expires_at - self.refresh_margin
+
+    def _cache_key(self):
+        """快取只適用於相同的租用戶與應用程式"""
+        return f"{config.GRAPH_API_TENANT_ID}:{config.GRAPH_API_CLIENT_ID}"
+
+    def _load_disk(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return
+        if cached.get("key") == self._cache_key():
+            self._token = cached.get("access_token")
+            self._expires_at = cached.get("expires_at", 0)
+
+    def _save_disk(self):
+        if not self.cache_file:
+            return
+        cached = {"key": self._cache_key(), "access_token": self._token, "expires_at": self._expires_at}
+        try:
+            # 權杖僅限目前使用者讀寫
+            fd = os.open(self.cache_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(cached, f)
+        except OSError:
+            pass
+
+    def _fetch(self):
+        """以 client credentials 向 Azure AD 取得新的權杖"""
+        token_url = f"{config.GRAPH_API_LOGIN_URL}/{config.GRAPH_API_TENANT_ID}/oauth2/v2.0/token"
+        payload = {
+            "client_id": config.GRAPH_API_CLIENT_ID,
+            "scope": "https://graph.microsoft.com/.default",
+            "client_secret": config.GRAPH_API_CLIENT_SECRET,
+            "grant_type": "client_credentials"
+        }
+        with metrics.phase("token_fetch"):
+            response = requests.post(token_url, data=payload, timeout=config.UPLOAD_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+        self._token = data["access_token"]
+        self._expires_at = time.time() + int(data.get("expires_in", 3600))
+        self._save_disk()
+
+    def get_token(self):
+        """取得有效的存取權杖（必要時才重新取得）"""
+        if self._valid():
+            return self._token
+        with self._lock:
+            if not self._valid():
+                self._load_disk()
+            if not self._valid():
+                self._fetch()
+            return self._token
+
+    def invalidate(self, token=None):
+        """捨棄目前的權杖（例如 API 回應 401 時），下次呼叫會重新取得
+
+        傳入失效的 token 時，若其他執行緒已換成新權杖則不重複捨棄
+        """
+        with self._lock:
+            if token is not None and token != self._token:
+                return
+            self._token = None
+            self._expires_at = 0
+            if self.cache_file and os.path.exists(self.cache_file):
+                try:
+                    os.remove(self.cache_file)
+                except OSError:
+                    pass
+
+
+# 全域權杖提供者
+graph_token_provider = GraphTokenProvider()
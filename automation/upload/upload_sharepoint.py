@@ -1,33 +1,104 @@
 import os
 import glob
+import json
+import time
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 from utils.logger import setup_logging
+from utils.run_manifest import run_manifest
+from utils.metrics import metrics
+from .graph_token import graph_token_provider
+from .content_hash import file_hashes, matches_remote
 import config
 
+def create_graph_session(pool_size=None):
+    """建立可重複使用連線（keep-alive）的 Graph API session，連線池大小與上傳執行緒數相同"""
+    pool_size = pool_size or config.UPLOAD_MAX_WORKERS
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 def get_graph_token():
-    """取得 Graph API 存取權杖"""
-    token_url = f"https://login.microsoftonline.com/{config.GRAPH_API_TENANT_ID}/oauth2/v2.0/token"
-    payload = {
-        "client_id": config.GRAPH_API_CLIENT_ID,
-        "scope": "https://graph.microsoft.com/.default",
-        "client_secret": config.GRAPH_API_CLIENT_SECRET,
-        "grant_type": "client_credentials"
-    }
-    response = requests.post(token_url, data=payload)
-    response.raise_for_status()
-    return response.json()["access_token"]
+    """取得 Graph API 存取權杖（沿用快取中尚未到期的權杖）"""
+    return graph_token_provider.get_token()
+
+def _item_url(file_name):
+    """目標資料夾中指定檔名的 Graph API 路徑"""
+    return f"{config.GRAPH_API_BASE_URL}/drives/{config.GRAPH_API_DRIVE_ID}/items/{config.GRAPH_API_FOLDER_ID}:/{file_name}:"
+
+def list_remote_items(token, logger, session=None):
+    """
+    取得目標資料夾中所有檔案的大小與雜湊 {檔名: driveItem}，用來略過內容未變更的檔案
+
+    一次列出整個資料夾（依 @odata.nextLink 分頁），取得失敗時回傳 None，改為全部上傳
+    """
+    http = session or requests
+    url = (f"{config.GRAPH_API_BASE_URL}/drives/{config.GRAPH_API_DRIVE_ID}/items/{config.GRAPH_API_FOLDER_ID}"
+           f"/children?$select=name,size,file&$top=999")
+    items = {}
+    try:
+        while url:
+            response = http.get(url, headers={"Authorization": f"Bearer {token}"}, timeout=config.UPLOAD_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+            for item in data.get("value", []):
+                items[item["name"]] = item
+            url = data.get("@odata.nextLink")
+    except Exception as e:
+        logger.warning(f"⚠️ 無法取得遠端檔案清單，將全部上傳: {e}")
+        return None
+    return items
+
+def is_unchanged(file_path, file_name, remote_items):
+    """遠端已有相同名稱、大小與內容雜湊的檔案"""
+    remote = (remote_items or {}).get(file_name)
+    if not remote:
+        return False
+    size = os.path.getsize(file_path)
+    # 大小不同時不需計算雜湊
+    if remote.get("size") != size:
+        return False
+    return matches_remote(file_hashes(file_path), size, remote)
 
-def upload_file(file_path, file_name, token, logger):
-    """上傳單一檔案到 SharePoint"""
-    url = f"https://graph.microsoft.com/v1.0/drives/{config.GRAPH_API_DRIVE_ID}/items/{config.GRAPH_API_FOLDER_ID}:/{file_name}:/content"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/octet-stream"
-    }
+def _graph_request(http, method, url, token, headers=None, rewind=None, **kwargs):
+    """
+    帶權杖呼叫 Graph API；回應 401（權杖已失效）時捨棄快取並以新權杖重試一次
+
+    Args:
+        rewind: 重試前呼叫，例如 data 為檔案時將讀取位置移回開頭
+
+    Returns:
+        tuple: (response, 最後使用的權杖)
+    """
+    headers = dict(headers or {}, Authorization=f"Bearer {token}")
+    response = http.request(method, url, headers=headers, timeout=config.UPLOAD_TIMEOUT, **kwargs)
+    if response.status_code == 401:
+        metrics.inc("rpa_retries_total", kind="token")
+        graph_token_provider.invalidate(token)
+        token = get_graph_token()
+        headers["Authorization"] = f"Bearer {token}"
+        if rewind:
+            rewind()
+        response = http.request(method, url, headers=headers, timeout=config.UPLOAD_TIMEOUT, **kwargs)
+    return response, token
+
+def upload_file(file_path, file_name, token, logger, session=None):
+    """上傳單一檔案到 SharePoint（超過 config.UPLOAD_SIMPLE_LIMIT 的檔案改用分段上傳）"""
+    if os.path.getsize(file_path) > config.UPLOAD_SIMPLE_LIMIT:
+        return upload_large_file(file_path, file_name, token, logger, session)
+
+    http = session or requests
+    url = f"{_item_url(file_name)}/content"
 
     try:
         with open(file_path, "rb") as f:
-            response = requests.put(url, headers=headers, data=f)
+            response, _ = _graph_request(http, "PUT", url, token, data=f, rewind=lambda: f.seek(0),
+                                         headers={"Content-Type": "application/octet-stream"})
             response.raise_for_status()
         logger.info(f"✅ 成功上傳: {file_name}")
         return True
@@ -35,6 +106,130 @@ def upload_file(file_path, file_name, token, logger):
         logger.error(f"❌ 上傳失敗 {file_name}: {e}")
         return False
 
+def _chunk_size():
+    """分段大小需為 320 KiB 的倍數"""
+    unit = 320 * 1024
+    return max(unit, config.UPLOAD_CHUNK_SIZE // unit * unit)
+
+def _state_path(file_path):
+    """記錄上傳 session 的檔案（中斷後可續傳）"""
+    return file_path + ".upload.json"
+
+def _load_upload_session(file_path):
+    """讀取尚未過期、且檔案未變更的上傳 session"""
+    try:
+        with open(_state_path(file_path), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    stat = os.stat(file_path)
+    if state.get("size") != stat.st_size or state.get("mtime") != stat.st_mtime:
+        return None
+    expires = state.get("expirationDateTime")  # 例如 2025-01-30T09:21:55.523Z（UTC）
+    if expires and datetime.strptime(expires[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc):
+        return None
+    return state
+
+def _save_upload_session(file_path, upload_url, expiration):
+    stat = os.stat(file_path)
+    state = {"uploadUrl": upload_url, "expirationDateTime": expiration,
+             "size": stat.st_size, "mtime": stat.st_mtime}
+    with open(_state_path(file_path), "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+def _clear_upload_session(file_path):
+    if os.path.exists(_state_path(file_path)):
+        os.remove(_state_path(file_path))
+
+def _next_offset(http, upload_url):
+    """向上傳 session 查詢下一個需要的位元組位置，session 已失效（或授權已過期）時回傳 None"""
+    response = http.get(upload_url, timeout=config.UPLOAD_TIMEOUT)
+    if response.status_code in (401, 404):
+        return None
+    response.raise_for_status()
+    ranges = response.json().get("nextExpectedRanges") or ["0-"]
+    return int(ranges[0].split("-")[0])
+
+def _create_upload_session(http, file_path, file_name, token):
+    """建立上傳 session 並記錄到 <檔案>.upload.json，回傳 (session 資訊, 最後使用的權杖)"""
+    response, token = _graph_request(
+        http, "POST", f"{_item_url(file_name)}/createUploadSession", token,
+        json={"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+    )
+    response.raise_for_status()
+    state = response.json()
+    _save_upload_session(file_path, state["uploadUrl"], state.get("expirationDateTime"))
+    return state, token
+
+def upload_large_file(file_path, file_name, token, logger, session=None):
+    """
+    以上傳 session 分段上傳大檔案
+
+    每次只讀取一個分段到記憶體；分段失敗時向 session 查詢已確認的位置後續傳，
+    session 資訊記錄在 <檔案>.upload.json，下次執行可從上次確認的位置繼續
+    """
+    http = session or requests
+    total = os.path.getsize(file_path)
+    chunk_size = _chunk_size()
+
+    try:
+        state = _load_upload_session(file_path)
+        offset = _next_offset(http, state["uploadUrl"]) if state else None
+        if offset is None:
+            state, token = _create_upload_session(http, file_path, file_name, token)
+            offset = 0
+        else:
+            logger.info(f"🔁 續傳 {file_name}：從第 {offset} 位元組開始")
+
+        upload_url = state["uploadUrl"]
+        retries = 0
+        reauthorized = False
+        with open(file_path, "rb") as f:
+            while offset < total:
+                f.seek(offset)
+                chunk = f.read(chunk_size)
+                end = offset + len(chunk) - 1
+                try:
+                    # uploadUrl 已包含授權資訊，不可再帶 Authorization 標頭
+                    response = http.put(upload_url, data=chunk, timeout=config.UPLOAD_TIMEOUT, headers={
+                        "Content-Length": str(len(chunk)),
+                        "Content-Range": f"bytes {offset}-{end}/{total}",
+                    })
+                    if response.status_code == 401 and not reauthorized:
+                        # uploadUrl 的授權已隨權杖失效：以新權杖重新建立上傳 session，從頭上傳（只重試一次）
+                        logger.warning(f"⚠️ {file_name} 上傳 session 授權已失效，以新權杖重新建立")
+                        metrics.inc("rpa_retries_total", kind="token")
+                        graph_token_provider.invalidate(token)
+                        state, token = _create_upload_session(http, file_path, file_name, get_graph_token())
+                        upload_url, offset, reauthorized = state["uploadUrl"], 0, True
+                        continue
+                    response.raise_for_status()
+                except requests.RequestException as e:
+                    retries += 1
+                    metrics.inc("rpa_retries_total", kind="upload_chunk")
+                    if retries > config.UPLOAD_CHUNK_RETRIES:
+                        raise
+                    logger.warning(f"⚠️ {file_name} 分段 {offset}-{end} 上傳失敗，重試 {retries}：{e}")
+                    offset = _next_offset(http, upload_url)
+                    if offset is None:
+                        raise Exception("上傳 session 已失效")
+                    continue
+
+                retries = 0
+                if response.status_code in (200, 201):
+                    offset = total
+                else:
+                    ranges = response.json().get("nextExpectedRanges") or [f"{end + 1}-"]
+                    offset = int(ranges[0].split("-")[0])
+
+        _clear_upload_session(file_path)
+        logger.info(f"✅ 成功上傳: {file_name}（分段上傳 {total} bytes）")
+        return True
+    except Exception as e:
+        logger.error(f"❌ 上傳失敗 {file_name}: {e}")
+        return False
+
 def scan_files(folder, patterns=["*.csv"]):
     """掃描指定資料夾中符合格式的檔案"""
     files = []
@@ -42,21 +237,42 @@ def scan_files(folder, patterns=["*.csv"]):
         files.extend(glob.glob(os.path.join(folder, pattern)))
     return sorted(files)
 
-def upload_files(file_paths, logger, token):
-    """批次上傳檔案"""
-    success, failed = 0, 0
-    for path in file_paths:
+def upload_files(file_paths, logger, token, session=None, max_workers=None, remote_items=None):
+    """
+    批次上傳檔案（以有上限的執行緒數同時上傳，共用同一個 session 的連線）
+
+    remote_items 為 list_remote_items 的結果，遠端內容相同的檔案略過上傳並視為成功
+    """
+    max_workers = max_workers or config.UPLOAD_MAX_WORKERS
+    own_session = session is None
+    session = session or create_graph_session(max_workers)
+    counts = {"success": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def _upload(path):
         if not os.path.exists(path):
             logger.error(f"❌ 檔案不存在: {path}")
-            failed += 1
-            continue
-        name = os.path.basename(path)
-        logger.info(f"📤 正在上傳: {name}")
-        if upload_file(path, name, token, logger):
-            success += 1
+            ok = False
         else:
-            failed += 1
-    return success, failed
+            name = os.path.basename(path)
+            started = time.monotonic()
+            if is_unchanged(path, name, remote_items):
+                logger.info(f"⏭ 內容未變更，略過: {name}")
+                ok = True
+            else:
+                logger.info(f"📤 正在上傳: {name}")
+                ok = upload_file(path, name, token, logger, session)
+            run_manifest.mark_uploaded(path, ok, seconds=time.monotonic() - started)
+        with lock:
+            counts["success" if ok else "failed"] += 1
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload") as executor:
+            list(executor.map(_upload, file_paths))
+    finally:
+        if own_session:
+            session.close()
+    return counts["success"], counts["failed"]
 
 def log_summary(logger, success, failed):
     total = success + failed
@@ -69,6 +285,11 @@ def upload_temp_files_to_sharepoint(logger=None):
     logger.info("=== 開始上傳 temp 資料夾中的檔案 ===")
 
     files = scan_files(config.DOWNLOAD_FOLDER)
+    # 上次執行已上傳且內容未變的檔案不再上傳
+    uploaded = [f for f in files if run_manifest.is_uploaded(f)]
+    if uploaded:
+        logger.info(f"⏭ 略過 {len(uploaded)} 個已上傳的檔案")
+        files = [f for f in files if f not in uploaded]
     if not files:
         logger.warning("⚠️ 找不到任何檔案")
         return {"success": 0, "failed": 0, "total": 0}
@@ -80,7 +301,8 @@ def upload_temp_files_to_sharepoint(logger=None):
         logger.error(f"❌ 存取權杖取得失敗: {e}")
         return {"success": 0, "failed": len(files), "total": len(files)}
 
-    success, failed = upload_files(files, logger, token)
+    remote_items = list_remote_items(token, logger) if config.UPLOAD_SKIP_UNCHANGED else None
+    success, failed = upload_files(files, logger, token, remote_items=remote_items)
     log_summary(logger, success, failed)
 
     return {"success": success, "failed": failed, "total": len(files)}
\ No newline at end of file
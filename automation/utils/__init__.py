@@ -4,9 +4,12 @@ Utils 模組 - 工具函數
 
 from .clear_folder import clear_temp_folder
 from .captcha_solver import solve_captcha, solve_captcha_from_element
+from .devtools import DevToolsEvents, devtools_events
 
 __all__ = [
     "clear_temp_folder",
     "solve_captcha",
-    "solve_captcha_from_element"
+    "solve_captcha_from_element",
+    "DevToolsEvents",
+    "devtools_events"
 ] 
\ No newline at end of file
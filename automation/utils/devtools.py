@@ -0,0 +1,57 @@
+"""
+Chrome DevTools 事件 - 讀取 ChromeDriver performance log 中的 DevTools 事件並分派給訂閱者
+"""
+
+import json
+import threading
+import weakref
+
+# 每個 driver 對應一個事件分派器
+_dispatchers = weakref.WeakKeyDictionary()
+_dispatchers_lock = threading.Lock()
+
+
+class DevToolsEvents:
+    """
+    DevTools 事件分派器
+
+    ChromeDriver 會將 DevTools 事件暫存在 performance log，每次讀取後即清空，
+    因此同一個 driver 的所有使用者必須共用這個分派器，而不是各自呼叫 get_log
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._handlers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, prefix, handler):
+        """訂閱 method 以 prefix 開頭的事件，handler(method, params)"""
+        self._handlers.append((prefix, handler))
+
+    def poll(self):
+        """讀取目前暫存的事件並分派，回傳事件數量"""
+        with self._lock:
+            try:
+                entries = self.driver.get_log("performance")
+            except Exception:
+                return 0
+
+            for entry in entries:
+                try:
+                    message = json.loads(entry["message"])["message"]
+                except (KeyError, ValueError):
+                    continue
+                method = message.get("method", "")
+                for prefix, handler in self._handlers:
+                    if method.startswith(prefix):
+                        handler(method, message.get("params", {}))
+            return len(entries)
+
+
+def devtools_events(driver):
+    """取得（或建立）driver 的 DevTools 事件分派器"""
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(driver)
+        if dispatcher is None:
+            dispatcher = _dispatchers[driver] = DevToolsEvents(driver)
+        return dispatcher
@@ -0,0 +1,3 @@
+"""
+效能測試 - 本機假入口網站與各項 benchmark（不需連線到正式入口網站）
+"""
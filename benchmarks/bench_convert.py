@@ -0,0 +1,196 @@
+"""
+匯出檔轉換 benchmark - 以合成匯出檔測量各轉換方式的吞吐量、記憶體峰值與輸出大小
+
+每個組合（列數 × 格式 × 編碼 × 轉換方式）在獨立的子行程中執行，記憶體峰值互不影響：
+    python -m benchmarks.bench_convert
+    python -m benchmarks.bench_convert --rows 1000 100000 1000000 --encodings utf-8 big5 utf-16
+    python -m benchmarks.bench_convert --output convert.json --baseline last.json --tolerance 0.2
+
+指定 --baseline 時，任一組合的 rows/s 比基準低超過 tolerance 即以結束代碼 1 結束
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import time
+from .synthetic_export import write_export
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource，記憶體峰值改以 None 表示
+    resource = None
+
+DEFAULT_ROWS = [1000, 10000, 100000]
+DEFAULT_FORMATS = ["html", "text"]
+DEFAULT_ENCODINGS = ["utf-8", "big5", "utf-16"]
+
+# 等待子行程回報結果時，每隔多久檢查一次子行程是否已異常結束（秒）
+RESULT_POLL_SECONDS = 1.0
+
+
+def available_backends():
+    """此主機可用的轉換方式（Excel COM 僅限 Windows 且需安裝 pywin32）"""
+    from automation.download.rename_query_file import win32com
+    return ["native", "com"] if win32com is not None else ["native"]
+
+
+def _peak_rss_bytes():
+    """目前行程的記憶體峰值（Linux 的 ru_maxrss 單位為 KB，macOS 為 bytes）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _convert_case(xls_file, csv_file, backend, results):
+    """子行程：以指定轉換方式轉換一次，回報耗時、成功與否與記憶體峰值"""
+    import config
+    from automation.download.rename_query_file import convert_xls_to_csv_trimmed
+
+    config.CONVERTER_BACKEND = backend
+    baseline = _peak_rss_bytes()
+    started = time.perf_counter()
+    ok = convert_xls_to_csv_trimmed(xls_file, csv_file)
+    results.put({
+        "ok": ok,
+        "seconds": time.perf_counter() - started,
+        "baseline_rss_bytes": baseline,
+        "peak_rss_bytes": _peak_rss_bytes(),
+    })
+
+
+def run_case(xls_file, csv_file, backend):
+    """在獨立的子行程中轉換一次"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_convert_case, args=(xls_file, csv_file, backend, results))
+    process.start()
+    result = None
+    try:
+        while result is None:
+            try:
+                result = results.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                # 子行程已結束：結果可能剛放入佇列，再取一次，仍沒有即視為異常結束（例如 MemoryError、匯入失敗）
+                try:
+                    result = results.get(timeout=RESULT_POLL_SECONDS)
+                except queue.Empty:
+                    break
+    finally:
+        process.join()
+    if result is None:
+        result = {"ok": False, "seconds": 0.0, "baseline_rss_bytes": None, "peak_rss_bytes": None,
+                  "error": f"子行程異常結束（exit code {process.exitcode}）"}
+    result["output_bytes"] = os.path.getsize(csv_file) if result["ok"] and os.path.exists(csv_file) else 0
+    return result
+
+
+def run_benchmark(rows_list=None, formats=None, encodings=None, backends=None, repeat=1):
+    """
+    依序執行所有組合，回傳各組合的結果（repeat 大於 1 時取最快的一次）
+
+    Returns:
+        list: [{"rows", "format", "encoding", "backend", "ok", "seconds", "rows_per_second",
+                "input_bytes", "output_bytes", "peak_rss_bytes", "baseline_rss_bytes"}]
+    """
+    rows_list = rows_list or DEFAULT_ROWS
+    formats = formats or DEFAULT_FORMATS
+    encodings = encodings or DEFAULT_ENCODINGS
+    backends = backends or available_backends()
+
+    work_dir = tempfile.mkdtemp(prefix="rpa-bench-convert-")
+    results = []
+    try:
+        for rows in rows_list:
+            for fmt in formats:
+                for encoding in encodings:
+                    xls_file = os.path.join(work_dir, f"query_{rows}_{fmt}_{encoding}.xls")
+                    input_bytes = write_export(xls_file, rows, fmt=fmt, encoding=encoding)
+                    for backend in backends:
+                        csv_file = os.path.join(work_dir, f"out_{backend}.csv")
+                        runs = [run_case(xls_file, csv_file, backend) for _ in range(max(1, repeat))]
+                        best = min(runs, key=lambda run: (not run["ok"], run["seconds"]))
+                        best.update(
+                            rows=rows, format=fmt, encoding=encoding, backend=backend, input_bytes=input_bytes,
+                            rows_per_second=round(rows / best["seconds"]) if best["ok"] and best["seconds"] else 0,
+                            seconds=round(best["seconds"], 4),
+                        )
+                        results.append(best)
+                        print_result(best)
+                    os.remove(xls_file)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def _mb(value):
+    return f"{value / 1024 / 1024:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def print_result(result):
+    status = "✅" if result["ok"] else "❌"
+    print(f"{status} {result['backend']:<7}{result['format']:<5}{result['encoding']:<7}{result['rows']:>9,} 列"
+          f"{result['seconds']:>9.3f}s{result['rows_per_second']:>11,} 列/秒"
+          f"  RSS 峰值 {_mb(result['peak_rss_bytes'])} MB"
+          f"  輸入 {_mb(result['input_bytes'])} MB  輸出 {_mb(result['output_bytes'])} MB")
+    if result.get("error"):
+        print(f"   {result['error']}")
+
+
+def _case_key(result):
+    return (result["rows"], result["format"], result["encoding"], result["backend"])
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """回傳 rows/s 比基準低超過 tolerance 的組合說明"""
+    previous = {_case_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(_case_key(result))
+        if not before or not before.get("rows_per_second"):
+            continue
+        if result["rows_per_second"] < before["rows_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{result['backend']} {result['format']} {result['encoding']} {result['rows']:,} 列："
+                f"{before['rows_per_second']:,} → {result['rows_per_second']:,} 列/秒"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="匯出檔轉換 benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="各組合的資料列數（1k ~ 1M）")
+    parser.add_argument("--formats", nargs="+", default=DEFAULT_FORMATS, choices=["html", "text"])
+    parser.add_argument("--encodings", nargs="+", default=DEFAULT_ENCODINGS)
+    parser.add_argument("--backends", nargs="+", choices=["native", "com"], help="預設為此主機可用的全部方式")
+    parser.add_argument("--repeat", type=int, default=1, help="每個組合執行次數（取最快的一次）")
+    parser.add_argument("--output", help="將結果寫成 JSON 檔（可作為下次的 --baseline）")
+    parser.add_argument("--baseline", help="比較用的前次結果 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="rows/s 可接受的下降比例")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.rows, args.formats, args.encodings, args.backends, args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    failed = [result for result in results if not result["ok"]]
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"⚠️ 效能下降：{regression}")
+
+    sys.exit(1 if failed or regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+端到端時段吞吐量 benchmark - 以本機假入口網站跑完整的 登入 → 查詢 → 匯出 → 下載 → 轉換 流程
+
+不需連線到正式入口網站與 SharePoint（不上傳），可在 Linux CI 以 headless Chrome 執行：
+    python -m benchmarks.bench_slots --slots 12 --workers 1
+    python -m benchmarks.bench_slots --mode http --slots 30 --workers 4 --output bench.json
+
+輸出每分鐘完成的時段數與各步驟耗時的 p50 / p95（取自 metrics 的 rpa_phase_seconds）
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import config
+from utils.metrics import metrics
+from utils.run_manifest import run_manifest
+from .fake_portal import FakePortal
+
+
+def bench_slots(count):
+    """產生 count 個 10 分鐘時段（自 00:00 起）"""
+    return [(index // 6, index % 6 * 10, index % 6 * 10 + 9) for index in range(count)]
+
+
+def configure(portal, work_dir, headless=True):
+    """將入口網站指向本機假入口網站，下載資料夾、執行清單與 state/ 下的檔案都改到暫存資料夾"""
+    config.WEBSITE_URL = portal.url
+    config.LOGIN_URL = f"{portal.url}/login"
+    config.DOWNLOAD_URL = f"{portal.url}/download"
+    config.WEBSITE_USERNAME = portal.username
+    config.WEBSITE_PASSWORD = portal.password
+    config.PORTAL_QUERY_URL = f"{portal.url}/log/query"
+    config.PORTAL_EXPORT_URL = f"{portal.url}/log/export"
+    config.PORTAL_VERIFY_SSL = True
+    config.SESSION_CHECK_URL = portal.url
+    config.SESSION_STORE_FOLDER = os.path.join(work_dir, "state", "sessions")
+    # 瀏覽器設定檔範本與 chromedriver 路徑快取也放在暫存資料夾，不可寫入正式執行使用的 state/
+    config.BROWSER_PROFILE_TEMPLATE = os.path.join(work_dir, "state", "chrome_profile")
+    config.CHROMEDRIVER_CACHE_FILE = os.path.join(work_dir, "state", "chromedriver_path.txt")
+    config.BROWSER_HEADLESS = headless
+    config.DOWNLOAD_FOLDER = os.path.join(work_dir, "temp")
+    config.WORKER_DOWNLOAD_FOLDER = os.path.join(config.DOWNLOAD_FOLDER, "workers")
+    run_manifest.folder = os.path.join(work_dir, "state")
+    os.makedirs(config.DOWNLOAD_FOLDER, exist_ok=True)
+
+
+def phase_summary():
+    """各步驟的次數、p50、p95 與最大耗時"""
+    phases = metrics.report()["histograms"].get("rpa_phase_seconds", [])
+    return {
+        entry["phase"]: {key: entry[key] for key in ("count", "p50", "p95", "max")}
+        for entry in phases
+    }
+
+
+def run_benchmark(mode="browser", slots=12, workers=1, latency=0.2, rows=1000, headless=True):
+    """
+    啟動假入口網站並以 BrowserPool / HttpExportPool 處理指定數量的時段
+
+    Returns:
+        dict: 設定、成功 / 失敗時段數、每分鐘時段數、啟動與處理耗時、各步驟耗時
+    """
+    # 延後匯入：先讓呼叫端有機會調整 config
+    from automation.browser.browser_pool import BrowserPool, HttpExportPool
+
+    work_dir = tempfile.mkdtemp(prefix="rpa-bench-")
+    metrics.reset()
+    try:
+        with FakePortal(latency=latency, rows=rows) as portal:
+            configure(portal, work_dir, headless)
+            pool_class = HttpExportPool if mode == "http" else BrowserPool
+            pool = pool_class(size=workers)
+            try:
+                started = time.monotonic()
+                if not pool.start():
+                    raise RuntimeError("無法啟動任何 worker")
+                ready = time.monotonic()
+                results = pool.run(bench_slots(slots))
+                finished = time.monotonic()
+            finally:
+                pool.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    succeeded = sum(1 for ok in results.values() if ok)
+    elapsed = finished - ready
+    return {
+        "mode": mode,
+        "workers": workers,
+        "slots": slots,
+        "rows_per_slot": rows,
+        "latency_seconds": latency,
+        "succeeded": succeeded,
+        "failed": slots - succeeded,
+        "startup_seconds": round(ready - started, 3),
+        "run_seconds": round(elapsed, 3),
+        "slots_per_minute": round(succeeded / elapsed * 60, 2) if elapsed else 0.0,
+        "phases": phase_summary(),
+    }
+
+
+def print_report(result):
+    print(f"📊 模式 {result['mode']}，{result['workers']} 個 worker，{result['slots']} 個時段"
+          f"（每個 {result['rows_per_slot']:,} 列，延遲 {result['latency_seconds']}s）")
+    print(f"   啟動 {result['startup_seconds']:.2f}s，處理 {result['run_seconds']:.2f}s，"
+          f"成功 {result['succeeded']} / 失敗 {result['failed']}，{result['slots_per_minute']:.2f} 時段/分鐘")
+    print(f"   {'步驟':<16}{'次數':>6}{'p50':>9}{'p95':>9}{'max':>9}")
+    for phase, stats in sorted(result["phases"].items()):
+        print(f"   {phase:<16}{stats['count']:>6}{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['max']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本機假入口網站的端到端時段吞吐量 benchmark")
+    parser.add_argument("--mode", default="browser", choices=["browser", "http"])
+    parser.add_argument("--slots", type=int, default=12, help="處理的時段數")
+    parser.add_argument("--workers", type=int, default=1, help="瀏覽器數（browser）或同時匯出數（http）")
+    parser.add_argument("--latency", type=float, default=0.2, help="假入口網站查詢 / 匯出 / 下載的延遲（秒）")
+    parser.add_argument("--rows", type=int, default=1000, help="每個時段匯出的資料列數")
+    parser.add_argument("--headed", action="store_true", help="顯示瀏覽器視窗（預設 headless）")
+    parser.add_argument("--output", help="另外將結果寫成 JSON 檔")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.mode, args.slots, args.workers, args.latency, args.rows,
+                           headless=not args.headed)
+    print_report(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    sys.exit(1 if result["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
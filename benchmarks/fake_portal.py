@@ -0,0 +1,249 @@
+"""
+本機假入口網站 - 模擬正式入口網站的登入、Log Data 查詢與匯出流程，供 benchmark 使用
+
+與正式入口網站相同的元素：
+- 登入表單：user_name / user_password / .new_btn
+- 主選單 #m0，點擊後載入 iframe#iframepagef2
+- iframe 內 #query_btn（第一次點擊顯示 minDate / maxDate / minTime / maxTime，第二次執行查詢）、
+  查詢結果的「Total : N」與 #export_btn → a.click-btn「Export to EXCEL」
+- 匯出時彈出 alert，接著開新分頁顯示「Download File」連結，下載 query.xls
+- HTTP 匯出模式使用的 /log/query 與 /log/export
+
+執行：python -m benchmarks.fake_portal --port 8765 --latency 0.2 --rows 5000
+"""
+
+import argparse
+import secrets
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+from .synthetic_export import iter_export_chunks
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Login</title></head><body>
+<form method="post" action="/login">
+  <input type="text" name="user_name">
+  <input type="password" name="user_password">
+  <button type="submit" class="new_btn">Login</button>
+</form>
+</body></html>"""
+
+MAIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Portal</title></head><body>
+<ul><li><a id="m0" href="#" onclick="openLogData(); return false;">Log Data</a></li></ul>
+<div id="content"></div>
+<script>
+function openLogData() {
+  document.getElementById('content').innerHTML =
+    '<iframe id="iframepagef2" name="iframepagef2" src="/logdata" width="100%" height="600"></iframe>';
+}
+</script>
+</body></html>"""
+
+LOG_DATA_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Log Data</title></head><body>
+<button id="query_btn">Query</button>
+<div id="form"></div>
+<div id="result"></div>
+<script>
+const byId = id => document.getElementById(id);
+function params() {
+  return new URLSearchParams({
+    minDate: byId('minDate').value, maxDate: byId('maxDate').value,
+    minTime: byId('minTime').value, maxTime: byId('maxTime').value
+  });
+}
+byId('query_btn').onclick = async () => {
+  if (!byId('minDate')) {
+    byId('form').innerHTML = ['minDate', 'maxDate', 'minTime', 'maxTime']
+      .map(id => `<input id="${id}" name="${id}">`).join('');
+    return;
+  }
+  byId('result').innerHTML = '';
+  const query = params();
+  const response = await fetch('/log/query', {method: 'POST', body: query});
+  byId('result').innerHTML = await response.text() +
+    '<button id="export_btn">Export</button>' +
+    '<div id="export_menu" style="display:none">' +
+    '<a class="click-btn" href="#">Export to CSV</a> <a class="click-btn" href="#" id="export_excel">Export to EXCEL</a>' +
+    '</div>';
+  byId('export_btn').onclick = () => { byId('export_menu').style.display = 'block'; };
+  byId('export_excel').onclick = event => {
+    event.preventDefault();
+    alert('資料量較大，匯出需要一些時間，請稍候');
+    window.open('/export?' + query.toString(), '_blank');
+  };
+};
+</script>
+</body></html>"""
+
+EXPORT_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Export</title></head><body>
+<p>匯出完成</p><a href="{href}">Download File</a>
+</body></html>"""
+
+
+class FakePortalHandler(BaseHTTPRequestHandler):
+    """假入口網站的請求處理（設定由 FakePortal 放在 server 上）"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def portal(self):
+        return self.server.portal
+
+    def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _redirect(self, location, headers=None):
+        self._send(302, headers=dict(headers or {}, Location=location))
+
+    def _logged_in(self):
+        cookies = self.headers.get("Cookie", "")
+        return any(part.strip() == f"sid={sid}" for part in cookies.split(";") for sid in self.portal.sessions)
+
+    def _form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/" and self._logged_in():
+            return self._redirect("/main")
+        if url.path in ("/", "/login"):
+            return self._send(200, LOGIN_PAGE)
+        if not self._logged_in():
+            return self._redirect("/login")
+        if url.path == "/main":
+            return self._send(200, MAIN_PAGE)
+        if url.path == "/logdata":
+            return self._send(200, LOG_DATA_PAGE)
+        if url.path == "/export":
+            time.sleep(self.portal.latency)
+            return self._send(200, EXPORT_PAGE.format(href="/download/query.xls?" + urlencode(query)))
+        if url.path == "/download/query.xls":
+            return self._send_export(query)
+        self._send(404, "Not Found")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        form = self._form()
+
+        if url.path == "/login":
+            if (form.get("user_name"), form.get("user_password")) != (self.portal.username, self.portal.password):
+                return self._redirect("/login")
+            sid = secrets.token_hex(16)
+            self.portal.sessions.add(sid)
+            return self._redirect("/main", {"Set-Cookie": f"sid={sid}; Path=/"})
+        if not self._logged_in():
+            return self._redirect("/login")
+        if url.path == "/log/query":
+            time.sleep(self.portal.latency)
+            return self._send(200, f'<div id="total">Total : {self.portal.rows:,}</div>')
+        if url.path == "/log/export":
+            time.sleep(self.portal.latency)
+            return self._send(200, EXPORT_PAGE.format(href="/download/query.xls?" + urlencode(form)))
+        self._send(404, "Not Found")
+
+    def _send_export(self, query):
+        """以 chunked 串流回傳合成的 query.xls"""
+        time.sleep(self.portal.latency)
+        try:
+            start = datetime.strptime(f"{query['minDate']} {query['minTime']}", "%Y-%m-%d %H:%M:%S")
+            end = datetime.strptime(f"{query['maxDate']} {query['maxTime']}", "%Y-%m-%d %H:%M:%S")
+        except (KeyError, ValueError):
+            return self._send(400, "Bad Request")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.ms-excel")
+        self.send_header("Content-Disposition", "attachment; filename=query.xls")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in iter_export_chunks(self.portal.rows, start, end, self.portal.export_format,
+                                        self.portal.encoding):
+            self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.portal.exports += 1
+
+
+class FakePortal:
+    """
+    在背景執行緒啟動的假入口網站
+
+    Args:
+        latency: 查詢、匯出頁面與下載開始前的延遲（秒）
+        rows: 每次匯出的資料列數（決定檔案大小）
+        export_format / encoding: 匯出檔格式與編碼（見 synthetic_export）
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, rows=1000, export_format="html",
+                 encoding="utf-8", username="bench", password="bench"):
+        self.latency = latency
+        self.rows = rows
+        self.export_format = export_format
+        self.encoding = encoding
+        self.username = username
+        self.password = password
+        self.sessions = set()
+        self.exports = 0
+        self.server = ThreadingHTTPServer((host, port), FakePortalHandler)
+        self.server.daemon_threads = True
+        self.server.portal = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-portal", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本機假入口網站")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="查詢 / 匯出 / 下載的延遲（秒）")
+    parser.add_argument("--rows", type=int, default=1000, help="每次匯出的資料列數")
+    parser.add_argument("--format", default="html", choices=["html", "text"])
+    parser.add_argument("--encoding", default="utf-8")
+    args = parser.parse_args()
+
+    portal = FakePortal(args.host, args.port, args.latency, args.rows, args.format, args.encoding)
+    print(f"🌐 假入口網站：{portal.url}（帳號 / 密碼：{portal.username} / {portal.password}）")
+    try:
+        portal.server.serve_forever()
+    except KeyboardInterrupt:
+        portal.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
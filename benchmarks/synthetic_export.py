@@ -0,0 +1,104 @@
+"""
+合成入口網站匯出檔 - 與「Export to EXCEL」相同的結構：6 列標題說明後接 9 個原始欄位的資料列
+"""
+
+import codecs
+import html
+import random
+from datetime import datetime, timedelta
+from automation.download.rename_query_file import HEADER_ROWS, SOURCE_COLUMNS
+
+GROUP_NAMES = ["業務部", "資訊處", "行政管理部", "展覽處", "市場拓展部"]
+ASCII_GROUP_NAMES = ["Sales", "IT", "Admin", "Exhibition", "Marketing"]
+APPLICATIONS = ["ChatGPT", "Gemini", "Copilot", "Claude", "Perplexity", "DeepL"]
+APP_TYPES = ["AI Tools", "Generative AI", "Translation"]
+ACTIONS = ["Allow", "Block", "Monitor"]
+
+
+def _encodable(values, encoding):
+    try:
+        for value in values:
+            value.encode(encoding)
+        return True
+    except (UnicodeEncodeError, LookupError):
+        return False
+
+
+def preamble_rows(start, end):
+    """匯出檔開頭的 6 列：標題、查詢條件、空白列，最後一列為欄位名稱"""
+    rows = [
+        ["Log Data"],
+        [f"Date : {start:%Y-%m-%d} ~ {end:%Y-%m-%d}"],
+        [f"Time : {start:%H:%M:%S} ~ {end:%H:%M:%S}"],
+        [""],
+        [""],
+        list(SOURCE_COLUMNS),
+    ]
+    assert len(rows) == HEADER_ROWS
+    return rows
+
+
+def synthetic_rows(count, start, end, encoding="utf-8", seed=0):
+    """產生 count 列介於 start ~ end 之間、依時間排序的資料列"""
+    rng = random.Random(seed)
+    groups = GROUP_NAMES if _encodable(GROUP_NAMES, encoding) else ASCII_GROUP_NAMES
+    span = max(1, int((end - start).total_seconds()))
+    offsets = sorted(rng.randrange(span) for _ in range(count))
+    for index, offset in enumerate(offsets, start=1):
+        user = f"10.{rng.randrange(1, 255)}.{rng.randrange(255)}.{rng.randrange(1, 255)}"
+        yield [
+            str(index),
+            user,
+            rng.choice(groups),
+            f"PC-{rng.randrange(1000, 9999)}",
+            f"104.18.{rng.randrange(255)}.{rng.randrange(1, 255)}",
+            rng.choice(APP_TYPES),
+            rng.choice(APPLICATIONS),
+            (start + timedelta(seconds=offset)).strftime("%Y-%m-%d %H:%M:%S"),
+            rng.choice(ACTIONS),
+        ]
+
+
+def iter_export_chunks(rows, start, end, fmt="html", encoding="utf-8", seed=0, chunk_rows=1000):
+    """
+    逐段產生匯出檔內容（bytes），可直接串流寫入檔案或 HTTP 回應
+
+    Args:
+        rows: 資料列數
+        start, end: 資料時間範圍（datetime）
+        fmt: "html"（HTML 表格）或 "text"（Tab 分隔）
+        encoding: 輸出編碼，例如 "utf-8"、"big5"、"utf-16"
+    """
+    if fmt == "html":
+        head = '<html><head><meta charset="{}"></head><body><table>'.format(encoding)
+        tail = "</table></body></html>"
+        render = lambda row: "<tr>" + "".join(f"<td>{html.escape(cell)}</td>" for cell in row) + "</tr>"
+    elif fmt == "text":
+        head, tail = "", ""
+        render = lambda row: "\t".join(row) + "\r\n"
+    else:
+        raise ValueError(f"不支援的匯出格式: {fmt}")
+
+    # 以增量編碼器輸出，utf-16 整個檔案只有開頭一個 BOM
+    encoder = codecs.getincrementalencoder(encoding)()
+
+    buffer = [head] + [render(row) for row in preamble_rows(start, end)]
+    for index, row in enumerate(synthetic_rows(rows, start, end, encoding, seed), start=1):
+        buffer.append(render(row))
+        if index % chunk_rows == 0:
+            yield encoder.encode("".join(buffer))
+            buffer = []
+    buffer.append(tail)
+    yield encoder.encode("".join(buffer), final=True)
+
+
+def write_export(path, rows, start=None, end=None, fmt="html", encoding="utf-8", seed=0):
+    """寫出合成匯出檔，回傳檔案位元組數"""
+    start = start or datetime(2025, 1, 1, 8, 0, 0)
+    end = end or start + timedelta(minutes=10) - timedelta(seconds=1)
+    size = 0
+    with open(path, "wb") as f:
+        for chunk in iter_export_chunks(rows, start, end, fmt, encoding, seed):
+            f.write(chunk)
+            size += len(chunk)
+    return size
@@ -21,6 +21,10 @@ GRAPH_API_CLIENT_SECRET = os.getenv('GRAPH_API_CLIENT_SECRET')
 GRAPH_API_TENANT_ID = os.getenv('GRAPH_API_TENANT_ID')
 GRAPH_API_DRIVE_ID = os.getenv('GRAPH_API_DRIVE_ID')
 GRAPH_API_FOLDER_ID = os.getenv('GRAPH_API_FOLDER_ID')
+GRAPH_API_BASE_URL = os.getenv('GRAPH_API_BASE_URL') or "https://graph.microsoft.com/v1.0"  # 可指向本機測試用的 stub
+GRAPH_API_LOGIN_URL = os.getenv('GRAPH_API_LOGIN_URL') or "https://login.microsoftonline.com"
+GRAPH_TOKEN_CACHE_FILE = os.getenv('GRAPH_TOKEN_CACHE_FILE')  # 選用：存取權杖快取檔案路徑，未設定則只快取在記憶體
+GRAPH_TOKEN_REFRESH_MARGIN = 300  # 權杖到期前幾秒就重新取得
 
 # Azure OpenAI 設定
 AZURE_OPENAI_ENDPOINT = os.getenv('AZURE_OPENAI_ENDPOINT')
@@ -38,28 +42,125 @@ START_MINUTE = 0  # 開始分鐘
 END_MINUTE = 60  # 結束分鐘
 TIME_INTERVAL_MINUTES = 10  # 每10分鐘一個區段
 
+# 時段規劃設定（依入口網站回報的筆數合併 / 拆分時段）
+ADAPTIVE_PLANNING = False  # 設為 True 啟用時段規劃
+PORTAL_ROW_COUNT_PATTERN = r"Total\s*:?\s*([\d,]+)"  # 從查詢結果文字擷取資料筆數的正規表示式
+EXPORT_ROW_LIMIT = 65000  # 入口網站單次匯出的筆數上限
+PLANNER_SPLIT_RATIO = 0.9  # 筆數超過上限的此比例時拆分時段
+PLANNER_MERGE_ROWS = 5000  # 相鄰時段合併後筆數不超過此值時合併
+
 
 # SharePoint 設定
 SHAREPOINT_SITE_URL = os.getenv('SHAREPOINT_SITE_URL')
+UPLOAD_MAX_WORKERS = 8  # 同時上傳的檔案數
+UPLOAD_TIMEOUT = 120  # 單一上傳請求逾時（秒）
+UPLOAD_SIMPLE_LIMIT = 4 * 1024 * 1024  # 超過此大小（bytes）改用上傳 session 分段上傳
+UPLOAD_CHUNK_SIZE = 10 * 320 * 1024  # 分段大小（bytes，需為 320 KiB 的倍數）
+UPLOAD_SKIP_UNCHANGED = True  # 上傳前比對遠端檔案的 quickXorHash / sha1Hash，內容相同則略過
+UPLOAD_CHUNK_RETRIES = 3  # 單一分段失敗時的續傳次數
 
 # Power Automate 設定
 POWER_AUTOMATE_WEBHOOK_URL = os.getenv('POWER_AUTOMATE_WEBHOOK_URL')
 
 # 瀏覽器設定
 BROWSER_HEADLESS = False  # 設為 True 可隱藏瀏覽器視窗
-BROWSER_TIMEOUT = 30  # 瀏覽器隱含等待時間（秒）
+BROWSER_TIMEOUT = 30  # 頁面載入逾時（秒）；不使用隱含等待
 DOWNLOAD_TIMEOUT = 300  # 5分鐘下載超時
+DOWNLOAD_START_TIMEOUT = 30  # 點擊下載連結後等待下載開始的時間（秒）
+DOWNLOAD_POLL_INTERVAL = 0.2  # 讀取 DevTools 下載事件的間隔（秒）
+DOWNLOAD_STABLE_SECONDS = 5  # 未收到完成事件且不知道檔案大小時，檔案大小需維持不變多久才視為下載完成（秒）
+
+# 瀏覽器啟動設定（縮短冷啟動與重啟時間）
+CHROMEDRIVER_PATH = os.getenv('CHROMEDRIVER_PATH')  # 選用：直接指定 chromedriver 路徑，不經過 webdriver-manager
+CHROMEDRIVER_CACHE_FILE = os.path.join(BASE_DIR, "state", "chromedriver_path.txt")  # 記住 webdriver-manager 取得的路徑，之後離線也能啟動
+BROWSER_PROFILE_TEMPLATE = os.path.join(BASE_DIR, "state", "chrome_profile")  # 第一次啟動後保存的設定檔範本，之後複製使用
+BROWSER_DISABLE_IMAGES = True  # 不載入圖片
+BROWSER_DISABLE_EXTENSIONS = True  # 停用擴充功能與背景服務
+
+# 登入 session 保存設定（登入後加密保存 cookies 與 storage，重新啟動瀏覽器時先還原，無效才重新登入；需安裝 cryptography）
+SESSION_REUSE = True
+SESSION_STORE_FOLDER = os.path.join(BASE_DIR, "state", "sessions")  # 每個 worker 一個加密檔
+SESSION_STORE_KEY = os.getenv('SESSION_STORE_KEY')  # 加密密鑰，未設定時使用 WEBSITE_PASSWORD
+SESSION_MAX_AGE = 8 * 3600  # 超過此秒數的保存 session 不再使用
+SESSION_CHECK_URL = f"{WEBSITE_URL}{os.getenv('SESSION_CHECK_PATH') or ''}"  # 驗證 session 的頁面（預設為首頁，有效時不會導向登入頁）
+SESSION_CHECK_TIMEOUT = 10  # 登入後等待頁面離開登入表單再保存的時間（秒）
+
+# 資源封鎖設定（以 DevTools Network.setBlockedURLs 封鎖操作入口網站不需要的資源，減少頁面載入時間與流量）
+BLOCK_RESOURCES = False  # 設為 True 啟用
+BLOCKED_URL_PATTERNS = []  # 網址規則（* 為萬用字元），例如 ["*google-analytics.com*", "*googletagmanager.com*"]
+BLOCKED_RESOURCE_TYPES = ["Image", "Font", "Media"]  # 依副檔名封鎖的資源類型，可加上 "Stylesheet"
+
+# 下載流程各步驟的等待上限（秒），條件成立就立即進行下一步
+STEP_TIMEOUT_DEFAULT = 10
+STEP_TIMEOUTS = {
+    "menu": 15,            # 首頁載入、主選單可點擊
+    "iframe": 10,          # iframe 載入並切換
+    "iframe_ready": 15,    # iframe 內頁面載入完成
+    "form": 10,            # 查詢表單欄位出現
+    "query": 60,           # 查詢結果載入
+    "export_menu": 10,     # 匯出選單出現
+    "alert": 30,           # 匯出提示視窗
+    "new_tab": 10,         # 下載頁面 Tab 開啟
+    "download_link": DOWNLOAD_TIMEOUT,        # 「Download File」連結出現
+    "download_start": DOWNLOAD_START_TIMEOUT,  # 點擊後下載開始
+    "download": DOWNLOAD_TIMEOUT,             # 下載完成
+}
+SLOT_DEADLINE = DOWNLOAD_TIMEOUT + 120  # 單一時段所有等待共用的時間預算（秒），用完即放棄該時段；None 表示不限制
+
+# 平行下載設定
+BROWSER_POOL_SIZE = 3  # 同時運行的 Chrome 瀏覽器數量（每個都會獨立登入）
+WORKER_DOWNLOAD_FOLDER = os.path.join(DOWNLOAD_FOLDER, "workers")  # 各 worker 的獨立下載資料夾
+
+# 下載模式設定
+DOWNLOAD_MODE = "browser"  # "browser"：全程以 Selenium 操作；"http"：瀏覽器僅負責登入，之後直接呼叫匯出 API
+PORTAL_QUERY_URL = f"{WEBSITE_URL}{os.getenv('PORTAL_QUERY_PATH') or '/log/query'}"  # 查詢 API
+PORTAL_EXPORT_URL = f"{WEBSITE_URL}{os.getenv('PORTAL_EXPORT_PATH') or '/log/export'}"  # 匯出 Excel API
+PORTAL_VERIFY_SSL = os.getenv('PORTAL_VERIFY_SSL', 'true').lower() != 'false'  # 入口網站使用自簽憑證時設為 false
+HTTP_EXPORT_WORKERS = 4  # HTTP 模式下共用同一個 session 的同時匯出數（入口網站若以 session 保存查詢條件請設為 1）
+HTTP_TIMEOUT = 60  # HTTP 請求逾時（秒）
+
+
+# 管線設定（下載 → 轉換 → 上傳同時進行）
+PIPELINE_ENABLED = True  # False 則維持下載全部完成後才一次上傳
+PIPELINE_QUEUE_SIZE = 10  # 各階段之間佇列的上限
+PIPELINE_CONVERT_WORKERS = 2  # 轉換階段的執行緒數
+
+# 執行清單設定（記錄各時段下載 / 轉換 / 上傳狀態，重新執行時只補做未完成的階段）
+MANIFEST_FOLDER = os.path.join(BASE_DIR, "state")  # 不可放在 temp 之內，否則會被清除
+
+# 檔案轉換設定
+CONVERTER_BACKEND = "auto"  # "native"：純 Python；"com"：Excel COM（僅 Windows）；"auto"：先用 Python，失敗再用 COM
+CONVERT_CHUNK_SIZE = 5000  # 串流轉換時每批處理的列數
+
+# 每日合併設定（將當天所有時段 CSV 依 Time 合併、去除重複列）
+DAILY_MERGE_ENABLED = True
+DAILY_FOLDER = os.path.join(BASE_DIR, "daily")  # 不可放在 temp 之內，否則會被清除
+
+# Parquet 封存設定（CSV 輸出不變，另外將每天的資料寫成依日期分區的 Parquet 檔）
+PARQUET_ARCHIVE_ENABLED = False  # 需安裝 pyarrow
+ARCHIVE_FOLDER = os.path.join(BASE_DIR, "archive")  # 不可放在 temp 之內，否則會被清除
+ARCHIVE_COMPRESSION = "zstd"
+ARCHIVE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"  # 匯出檔 Time 欄位的格式
+ARCHIVE_BLOCK_SIZE = 16 * 1024 * 1024  # 串流讀取 CSV 每批的位元組數
 
+# 執行指標設定（每次執行結束時寫出）
+METRICS_TEXTFILE = os.getenv('METRICS_TEXTFILE') or os.path.join(BASE_DIR, "state", "rpa_metrics.prom")  # 可指向 node_exporter 的 textfile 目錄
+METRICS_REPORT_FOLDER = os.path.join(BASE_DIR, "state", "reports")  # 每次執行的 JSON 報告
 
 # 日誌設定
 LOG_LEVEL = "INFO"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_FILE = os.path.join(BASE_DIR, "rpa.log")
+LOG_ROTATION = "size"  # "size"：依大小輪替；"time"：依時間輪替；None：不輪替
+LOG_MAX_BYTES = 10 * 1024 * 1024  # 依大小輪替時單一檔案上限
+LOG_ROTATE_WHEN = "midnight"  # 依時間輪替的週期（TimedRotatingFileHandler 的 when）
+LOG_BACKUP_COUNT = 14  # 保留的舊日誌檔數
+LOG_JSON = False  # True 時日誌檔改為每行一筆 JSON（控制台維持一般格式）
 
 # 確保必要資料夾存在
 def ensure_directories():
     """確保必要的資料夾存在"""
-    directories = [DOWNLOAD_FOLDER]
+    directories = [DOWNLOAD_FOLDER, MANIFEST_FOLDER]
     for directory in directories:
         if not os.path.exists(directory):
             os.makedirs(directory)
@@ -1,111 +1,159 @@
+from collections import Counter
+from datetime import datetime, timedelta
 from automation import (
-    BrowserManager, set_global_browser, close_global_browser,
-    login, download_excel, upload_temp_files_to_sharepoint,
-    clear_temp_folder, report_download_status
+    BrowserPool, HttpExportPool, SlotPipeline, upload_temp_files_to_sharepoint,
+    merge_day, archive_day, clear_temp_folder, report_download_status
 )
+from automation.download.rename_query_file import convert_query_file
 from utils.logger import setup_logging
 from utils.execution_logger import execution_logger
-import time
+from utils.run_manifest import run_manifest
+from utils.run_ledger import run_ledger
+from utils.metrics import metrics
 import config
 
-def chrome_simple(logger):
-    logger.info("開啟 Chrome 瀏覽器...")
-    
-    try:
-        # 建立瀏覽器並設定為全域實例（RPA 模式）
-        browser = BrowserManager(headless=False, rpa_mode=True)
-        browser.setup_driver()
-        set_global_browser(browser)  # 設定為全域瀏覽器
-        
-        logger.info("✓ Chrome 瀏覽器成功啟動")
-        
-        # 開啟網頁
-        browser.driver.maximize_window()
-        browser.driver.get(config.WEBSITE_URL)
-        logger.info("✓ 成功開啟網頁")
-        
-        return browser
-        
-    except Exception as e:
-        logger.error(f"❌ 測試失敗: {str(e)}")
-        return None
+def build_time_slots():
+    """依 config 的時間設定產生所有下載時段 (hour, start_minute, end_minute)"""
+    slots = []
+    for hour in range(config.START_HOUR, config.END_HOUR + 1):
+        for minute in range(config.START_MINUTE, config.END_MINUTE, config.TIME_INTERVAL_MINUTES):
+            slots.append((hour, minute, minute + 9))
+    return slots
+
+def resume_pending(date, pending, pipeline, logger):
+    """上次執行已下載 / 已轉換的時段直接從下一個階段繼續，不重新下載"""
+    for slot in pending["convert"]:
+        raw_file = run_manifest.stage_file(date, slot, "download")
+        if pipeline:
+            pipeline.handoff(slot, date, raw_file)
+            continue
+        try:
+            convert_query_file(raw_file, date, *slot, logger)
+        except Exception:
+            pass  # 錯誤已記錄在日誌與執行清單
+    # 非管線模式下，待上傳的 CSV 由 upload_temp_files_to_sharepoint 掃描 temp 資料夾時上傳
+    if pipeline:
+        for slot in pending["upload"]:
+            pipeline.resume_upload(run_manifest.stage_file(date, slot, "convert"))
 
 if __name__ == "__main__":
-    # 啟動瀏覽器
-    browser_logger = setup_logging("啟動瀏覽器")
-    browser = chrome_simple(browser_logger)
+    download_logger = setup_logging("下載流程")
+    date = (datetime.today() - timedelta(days=1)).strftime("%Y%m%d")
 
-    if browser:
-        # 登入網頁
-        login_logger = setup_logging("登入網頁")
-        login(browser.driver, config.WEBSITE_USERNAME, config.WEBSITE_PASSWORD)
+    # 設定時間區段：沿用執行清單中上次規劃的時段，否則使用 config 中的時間設定（可依資料筆數重新規劃）
+    planned = run_manifest.planned_slots(date)
+    slots = planned or build_time_slots()
+    pending = run_manifest.pending(date, slots)
+    if planned:
+        if not any(pending.values()):
+            download_logger.info(f"✅ {date} 所有時段皆已完成上傳，不需重新執行")
+            raise SystemExit(0)
+        download_logger.info(
+            f"♻️ 沿用執行清單：待下載 {len(pending['download'])}，"
+            f"待轉換 {len(pending['convert'])}，待上傳 {len(pending['upload'])}"
+        )
 
-        # 下載流程
-        download_logger = setup_logging("下載流程")
-        
-        # 設定時間區段：使用 config 中的時間設定
-        for hour in range(config.START_HOUR, config.END_HOUR + 1):
-            for minute in range(config.START_MINUTE, config.END_MINUTE, config.TIME_INTERVAL_MINUTES):
-                success = download_excel(browser.driver, hour, minute, minute + 9, download_logger)
-                if not success:
-                    download_logger.warning(f"⚠️ 時段 {hour}:{minute:02} ~ {hour}:{minute+9:02} 處理失敗")
-                    
-                    # 檢查是否需要重新啟動瀏覽器
-                    try:
-                        browser.driver.current_url
-                        download_logger.info("✅ 瀏覽器 session 仍然有效，繼續下一個時段")
-                    except Exception as e:
-                        download_logger.error(f"❌ 瀏覽器 session 已失效：{e}")
-                        download_logger.info("🔄 嘗試重新啟動瀏覽器...")
-                        
-                        try:
-                            # 關閉舊瀏覽器
-                            close_global_browser()
-                            
-                            # 重新啟動瀏覽器
-                            browser = chrome_simple(browser_logger)
-                            if browser:
-                                # 重新登入
-                                login(browser.driver, config.WEBSITE_USERNAME, config.WEBSITE_PASSWORD)
-                                download_logger.info("✅ 瀏覽器重新啟動成功")
-                            else:
-                                download_logger.error("❌ 無法重新啟動瀏覽器，跳過剩餘時段")
-                                break
-                        except Exception as restart_error:
-                            download_logger.error(f"❌ 重新啟動瀏覽器失敗：{restart_error}")
-                            break
-                
-                time.sleep(2)
+    # 本次執行的帳本：各階段完成時即時記錄，摘要與 Teams 通知直接查詢
+    waiting = set(pending["download"]) | set(pending["convert"])
+    run_ledger.begin(date, slots, converted=[slot for slot in slots if slot not in waiting])
 
-        download_logger.info("✓ 所有時間區段處理完畢，關閉瀏覽器...")
-        close_global_browser()
-        
-        # 上傳到 SharePoint
-        upload_logger = setup_logging("上傳到 SharePoint")
-        try:
+    # 管線模式：每個時段下載完成後立即交給轉換、上傳階段
+    pipeline = SlotPipeline(download_logger).start() if config.PIPELINE_ENABLED else None
+    resume_pending(date, pending, pipeline, download_logger)
+
+    # 啟動瀏覽器池（每個 worker 各自啟動瀏覽器並登入網頁）；HTTP 模式下瀏覽器僅用於登入
+    browser_ok = True
+    if pending["download"]:
+        browser_logger = setup_logging("啟動瀏覽器")
+        if config.DOWNLOAD_MODE == "http":
+            pool = HttpExportPool(config.HTTP_EXPORT_WORKERS, browser_logger)
+        else:
+            pool = BrowserPool(config.BROWSER_POOL_SIZE, browser_logger)
+
+        if pool.start():
+            # 由各 worker 從共用佇列取出待下載的時段處理
+            try:
+                if config.ADAPTIVE_PLANNING and not planned:
+                    slots = pool.plan(slots)
+                    pending["download"] = slots
+                    run_ledger.begin(date, slots)
+                if not planned:
+                    run_manifest.set_slots(date, slots)
+                results = pool.run(pending["download"], handoff=pipeline.handoff if pipeline else None)
+                failed = [slot for slot, ok in results.items() if not ok]
+                # 失敗原因：step_timeout（單一步驟逾時）、deadline（時段時間預算用完）、error、convert（已下載、轉換失敗）；未處理的時段為 skipped
+                reasons = {slot: getattr(results[slot], "status", "skipped") for slot in failed}
+                for slot in failed:
+                    # 已下載但轉換失敗的時段：轉換失敗已記錄，保留下載紀錄，重新執行時只需轉換 raw 檔
+                    if run_manifest.pending_stage(date, slot) != "download":
+                        reasons[slot] = "convert"
+                        continue
+                    run_manifest.mark(date, slot, "download", ok=False, error=reasons[slot])
+                counts = Counter(reasons.values())
+                detail = "、".join(f"{reason} {count}" for reason, count in sorted(counts.items()))
+                download_logger.info(f"📊 下載完成：✅ 成功 {len(results) - len(failed)}，❌ 失敗 {len(failed)}"
+                                     + (f"（{detail}）" if detail else ""))
+            finally:
+                download_logger.info("✓ 所有時間區段處理完畢，關閉瀏覽器...")
+                pool.close()
+        else:
+            browser_logger.error("❌ 無法啟動瀏覽器！")
+            browser_ok = False
+
+    # 上傳到 SharePoint
+    upload_logger = setup_logging("上傳到 SharePoint")
+    try:
+        if pipeline:
+            upload_result = pipeline.finish()
+        else:
             upload_result = upload_temp_files_to_sharepoint(upload_logger)
-            upload_logger.info("✓ 上傳流程完成")
+        upload_logger.info("✓ 上傳流程完成")
+    except Exception as e:
+        upload_logger.error(f"❌ 上傳流程失敗: {str(e)}")
+
+    # 每日合併（於清除 temp 資料夾之前）
+    if config.DAILY_MERGE_ENABLED:
+        merge_logger = setup_logging("每日合併")
+        try:
+            merge_day(date, logger=merge_logger)
         except Exception as e:
-            upload_logger.error(f"❌ 上傳流程失敗: {str(e)}")
-        
+            merge_logger.error(f"❌ 每日合併失敗: {str(e)}")
+
+    # Parquet 封存（有每日合併檔時使用合併檔）
+    if config.PARQUET_ARCHIVE_ENABLED:
+        archive_logger = setup_logging("Parquet 封存")
+        try:
+            archive_day(date, logger=archive_logger)
+        except Exception as e:
+            archive_logger.error(f"❌ Parquet 封存失敗: {str(e)}")
+
+    if browser_ok:
         # 發送結果到 Teams
         teams_logger = setup_logging("發送結果到 Teams")
         try:
-            report_download_status()
+            report_download_status(slots)
             teams_logger.info("✓ 發送結果到 Teams 完成")
         except Exception as e:
             teams_logger.error(f"❌ Teams 通知失敗: {str(e)}")
-        
+
         # 輸出執行摘要
-        summary = execution_logger.get_summary_text()
-        stats = execution_logger.get_statistics()
-        
-        # 清除 temp 資料夾
+        summary = execution_logger.get_summary_text(slots)
+        stats = execution_logger.get_statistics(slots)
+
+        # 清除 temp 資料夾：仍有未完成的時段時保留檔案，重新執行時可直接沿用
         cleanup_logger = setup_logging("清除 temp 資料夾")
-        try:
-            clear_temp_folder()
-            cleanup_logger.info("✓ 清除 temp 資料夾完成")
-        except Exception as e:
-            cleanup_logger.error(f"❌ 清除 temp 資料夾失敗: {str(e)}")
-    else:
-        browser_logger.error("❌ 無法啟動瀏覽器！")
\ No newline at end of file
+        if not run_manifest.is_complete(date, slots):
+            cleanup_logger.warning("⚠️ 仍有時段未完成上傳，保留 temp 資料夾供重新執行時沿用")
+        else:
+            try:
+                clear_temp_folder()
+                cleanup_logger.info("✓ 清除 temp 資料夾完成")
+            except Exception as e:
+                cleanup_logger.error(f"❌ 清除 temp 資料夾失敗: {str(e)}")
+
+    # 寫出執行指標（Prometheus textfile 與 JSON 執行報告），瀏覽器啟動失敗時也寫出
+    try:
+        paths = metrics.write_reports(date, {"statistics": execution_logger.get_statistics(slots)})
+        download_logger.info(f"📈 執行指標已寫入：{paths['prometheus']}、{paths['report']}")
+    except Exception as e:
+        download_logger.error(f"❌ 執行指標寫入失敗: {str(e)}")
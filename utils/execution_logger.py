@@ -3,52 +3,71 @@ from typing import Dict, List, Optional
 import logging
 import os
 import config
+from utils.run_ledger import run_ledger
+
+def default_slots() -> list:
+    """未指定時段時使用的固定 10 分鐘時段"""
+    return [(hour, i * 10, i * 10 + 9) for hour in range(8, 18) for i in range(6)]
+
+def expected_filename(date: str, slot) -> str:
+    """時段轉換後的 CSV 檔名（與 convert_query_file 的輸出相同）"""
+    hour, start_min, end_min = slot
+    return f"logger_urlLog_{date}_{hour:02d}{start_min:02d}-{hour:02d}{end_min:02d}.csv"
 
 class ExecutionLogger:
-    """執行結果記錄器，整合現有的檔案檢查機制"""
+    """執行結果記錄器：本次執行有帳本（run_ledger）時直接查詢，否則掃描一次下載資料夾"""
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
     
-    def generate_expected_filenames(self) -> list[str]:
+    @staticmethod
+    def _date() -> str:
+        return (datetime.now() - timedelta(days=1)).strftime("%Y%m%d")
+    
+    def _resolve_slots(self, slots=None) -> list:
+        """slots 為實際規劃的時段；None 時使用本次執行帳本中的時段，再沒有則使用固定 10 分鐘時段"""
+        if slots is not None:
+            return list(slots)
+        if run_ledger.covers(self._date()):
+            return run_ledger.slots
+        return default_slots()
+    
+    def generate_expected_filenames(self, slots=None) -> list[str]:
         """產生預期的檔案名稱列表"""
-        filenames = []
-        yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y%m%d")
-        for hour in range(8, 18):
-            for i in range(6):
-                start_min = i * 10
-                end_min = start_min + 9
-                start_str = f"{hour:02d}{start_min:02d}"
-                end_str = f"{hour:02d}{end_min:02d}"
-                interval = f"{start_str}-{end_str}"
-                filename = f"logger_url_{yesterday}_{interval}.xls"
-                filenames.append(filename)
-        return filenames
+        date = self._date()
+        return [expected_filename(date, slot) for slot in self._resolve_slots(slots)]
     
-    def check_download_files(self) -> Dict:
-        """檢查下載檔案並回傳詳細結果"""
+    def check_download_files(self, slots=None) -> Dict:
+        """檢查各時段是否已產生 CSV 並回傳詳細結果"""
         download_folder = config.DOWNLOAD_FOLDER
-        expected_files = self.generate_expected_filenames()
+        date = self._date()
+        slots = self._resolve_slots(slots)
+        
+        if run_ledger.covers(date, slots):
+            succeeded = run_ledger.succeeded
+        else:
+            # 沒有帳本時只掃描一次資料夾
+            existing = set(os.listdir(download_folder)) if os.path.isdir(download_folder) else set()
+            succeeded = lambda slot: expected_filename(date, slot) in existing
         
         results = {
             "success_count": 0,
             "fail_count": 0,
-            "total_count": len(expected_files),
+            "total_count": len(slots),
             "success_files": [],
             "failed_files": [],
             "details": []
         }
         
-        for filename in expected_files:
-            full_path = os.path.join(download_folder, filename)
-            interval = filename.replace(".xls", "")
-            exists = os.path.exists(full_path)
+        for slot in slots:
+            filename = expected_filename(date, slot)
+            exists = succeeded(slot)
             
             file_result = {
                 "filename": filename,
-                "interval": interval,
+                "interval": filename.replace(".csv", ""),
                 "exists": exists,
-                "path": full_path
+                "path": os.path.join(download_folder, filename)
             }
             
             results["details"].append(file_result)
@@ -62,9 +81,9 @@ class ExecutionLogger:
         
         return results
     
-    def get_summary_text(self) -> str:
+    def get_summary_text(self, slots=None) -> str:
         """取得格式化的摘要文字"""
-        results = self.check_download_files()
+        results = self.check_download_files(slots)
         log_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
         
         lines = [f"{log_date} AI上網統計紀錄：\n"]
@@ -78,25 +97,34 @@ class ExecutionLogger:
         
         return "\n".join(lines)
     
-    def get_statistics(self) -> Dict:
-        """取得統計資訊"""
-        results = self.check_download_files()
-        total = results["total_count"]
-        success = results["success_count"]
-        failed = results["fail_count"]
+    def get_statistics(self, slots=None) -> Dict:
+        """取得統計資訊（有帳本時直接取用累計的計數與各階段耗時）"""
+        date = self._date()
+        if run_ledger.covers(date, slots):
+            total = run_ledger.total_count
+            success = run_ledger.success_count
+            failed_files = [expected_filename(date, slot) for slot in run_ledger.failed_slots()]
+            timings = run_ledger.timings()
+        else:
+            results = self.check_download_files(slots)
+            total = results["total_count"]
+            success = results["success_count"]
+            failed_files = results["failed_files"]
+            timings = {}
+        failed = total - success
         
         return {
             "total": total,
             "success": success,
             "failed": failed,
             "success_rate": (success / total * 100) if total > 0 else 0,
-            "failed_files": results["failed_files"]
+            "failed_files": failed_files,
+            "timings": timings
         }
     
-    def get_failed_segments(self) -> List[str]:
+    def get_failed_segments(self, slots=None) -> List[str]:
         """取得失敗的區段列表"""
-        results = self.check_download_files()
-        return results["failed_files"]
+        return self.get_statistics(slots)["failed_files"]
 
 # 全域執行記錄器實例
 execution_logger = ExecutionLogger() 
\ No newline at end of file
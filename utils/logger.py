@@ -3,10 +3,89 @@
 提供可選的日誌功能
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
 from datetime import datetime
 import config
+from utils.metrics import metrics
+
+
+class JsonFormatter(logging.Formatter):
+    """結構化日誌：每筆記錄輸出一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _file_handler(log_file):
+    """依 config.LOG_ROTATION 建立檔案 handler：依大小、依時間輪替或不輪替"""
+    log_dir = os.path.dirname(log_file)
+    if log_dir and not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    if config.LOG_ROTATION == "size":
+        return logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=config.LOG_MAX_BYTES, backupCount=config.LOG_BACKUP_COUNT, encoding='utf-8'
+        )
+    if config.LOG_ROTATION == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            log_file, when=config.LOG_ROTATE_WHEN, backupCount=config.LOG_BACKUP_COUNT, encoding='utf-8'
+        )
+    return logging.FileHandler(log_file, encoding='utf-8')
+
+
+# 每個日誌檔共用一個 QueueHandler 與背景 QueueListener：
+# 呼叫端只把記錄放進佇列，寫檔與輸出到控制台都在背景執行緒進行
+_queue_handlers = {}
+_listeners = []
+_queue_lock = threading.Lock()
+
+
+def _get_queue_handler(log_file):
+    with _queue_lock:
+        if log_file not in _queue_handlers:
+            formatter = logging.Formatter(config.LOG_FORMAT)
+            handlers = []
+            if log_file:
+                file_handler = _file_handler(log_file)
+                file_handler.setFormatter(JsonFormatter() if config.LOG_JSON else formatter)
+                handlers.append(file_handler)
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(formatter)
+            handlers.append(console_handler)
+
+            log_queue = queue.Queue(-1)
+            listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            _listeners.append(listener)
+            _queue_handlers[log_file] = logging.handlers.QueueHandler(log_queue)
+        return _queue_handlers[log_file]
+
+
+def shutdown_logging():
+    """停止背景寫入執行緒，並寫完佇列中剩餘的記錄（程式結束時自動呼叫）"""
+    with _queue_lock:
+        for listener in _listeners:
+            listener.stop()
+        _listeners.clear()
+        _queue_handlers.clear()
+
+
+atexit.register(shutdown_logging)
 
 class RPALogger:
     """RPA 日誌管理器"""
@@ -28,28 +107,9 @@ class RPALogger:
         self.logger = logging.getLogger(name)
         self.logger.setLevel(getattr(logging, self.log_level.upper()))
         
-        # 清除現有的 handlers（避免重複）
+        # 避免重複加入 handler；實際的檔案 / 控制台輸出由背景執行緒處理
         if not self.logger.handlers:
-            # 設定格式
-            formatter = logging.Formatter(config.LOG_FORMAT)
-            
-            # 檔案 handler
-            if self.log_file:
-                # 確保日誌目錄存在
-                log_dir = os.path.dirname(self.log_file)
-                if log_dir and not os.path.exists(log_dir):
-                    os.makedirs(log_dir)
-                
-                file_handler = logging.FileHandler(self.log_file, encoding='utf-8')
-                file_handler.setLevel(getattr(logging, self.log_level.upper()))
-                file_handler.setFormatter(formatter)
-                self.logger.addHandler(file_handler)
-            
-            # 控制台 handler
-            console_handler = logging.StreamHandler()
-            console_handler.setLevel(getattr(logging, self.log_level.upper()))
-            console_handler.setFormatter(formatter)
-            self.logger.addHandler(console_handler)
+            self.logger.addHandler(_get_queue_handler(self.log_file))
     
     def __str__(self):
         """字串表示"""
@@ -192,7 +252,7 @@ def log_function_call(func_name, *args, **kwargs):
 
 def log_execution_time(func_name):
     """
-    記錄執行時間的裝飾器
+    記錄執行時間的裝飾器（耗時同時記入執行指標 rpa_phase_seconds）
     
     Args:
         func_name (str): 函數名稱
@@ -207,11 +267,13 @@ def log_execution_time(func_name):
                 result = func(*args, **kwargs)
                 end_time = datetime.now()
                 execution_time = (end_time - start_time).total_seconds()
+                metrics.observe("rpa_phase_seconds", execution_time, phase=func_name)
                 logger.info(f"執行完成: {func_name} (耗時: {execution_time:.2f} 秒)")
                 return result
             except Exception as e:
                 end_time = datetime.now()
                 execution_time = (end_time - start_time).total_seconds()
+                metrics.observe("rpa_phase_seconds", execution_time, phase=func_name)
                 logger.error(f"執行失敗: {func_name} (耗時: {execution_time:.2f} 秒) - {str(e)}")
                 raise
         return wrapper
@@ -0,0 +1,175 @@
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+import json
+import math
+import os
+import threading
+import time
+import config
+
+# 耗時直方圖的區間上限（秒）
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# 指標說明（Prometheus HELP）
+METRIC_HELP = {
+    "rpa_phase_seconds": "各步驟耗時（登入、選單、查詢、匯出、下載等待、權杖取得等）",
+    "rpa_stage_seconds": "各時段下載 / 轉換 / 上傳階段的耗時",
+    "rpa_slots_total": "各階段處理的時段數",
+    "rpa_rows_total": "轉換的資料列數",
+    "rpa_bytes_total": "各階段產出的檔案位元組數",
+    "rpa_retries_total": "重試次數",
+    "rpa_slot_failures_total": "下載失敗的時段數（依原因：step_timeout / deadline / error）",
+    "rpa_logins_total": "入口網站登入次數（session 還原 / 登入表單）",
+    "rpa_blocked_requests_total": "資源封鎖擋下的請求數",
+    "rpa_page_bytes_total": "瀏覽器自入口網站傳輸的位元組數",
+}
+
+
+def _label_key(labels: Dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: Optional[Dict] = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _percentile(samples, fraction):
+    """最近排名法的百分位數"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class MetricsRegistry:
+    """
+    執行指標：各步驟的耗時直方圖與時段、資料列、位元組、重試計數
+
+    執行結束時寫成 Prometheus textfile（供 node_exporter 的 textfile collector 讀取）與 JSON 執行報告，
+    可跨日追蹤時段吞吐量與 p95 延遲；可同時被多個執行緒呼叫
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}    # {name: {label_key: value}}
+        self._histograms = {}  # {name: {label_key: [觀測值]}}
+        self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """計數器累加"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """記錄一次耗時"""
+        key = _label_key(labels)
+        with self._lock:
+            self._histograms.setdefault(name, {}).setdefault(key, []).append(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """記錄區塊內的耗時（發生例外也會記錄）"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, **labels)
+
+    def phase(self, phase: str):
+        """記錄步驟耗時，例如 with metrics.phase("login"): ..."""
+        return self.timer("rpa_phase_seconds", phase=phase)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    def prometheus_text(self) -> str:
+        """Prometheus 文字格式"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, samples in sorted(series.items()):
+                    for bound in self.buckets:
+                        count = sum(1 for sample in samples if sample <= bound)
+                        lines.append(f"{name}_bucket{_format_labels(key, {'le': bound})} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, {'le': '+Inf'})} {len(samples)}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {sum(samples):.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {len(samples)}")
+
+            lines.append("# HELP rpa_last_run_timestamp_seconds 最近一次執行結束的時間")
+            lines.append("# TYPE rpa_last_run_timestamp_seconds gauge")
+            lines.append(f"rpa_last_run_timestamp_seconds {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+    def report(self, extra: Optional[Dict] = None) -> Dict:
+        """JSON 執行報告：計數器與各步驟的次數、總和、p50、p95、最大值"""
+        with self._lock:
+            counters = {
+                name: [dict(key, value=value) for key, value in sorted(series.items())]
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: [
+                    dict(key, count=len(samples), sum=round(sum(samples), 3),
+                         p50=round(_percentile(samples, 0.5), 3), p95=round(_percentile(samples, 0.95), 3),
+                         max=round(max(samples), 3))
+                    for key, samples in sorted(series.items())
+                ]
+                for name, series in self._histograms.items()
+            }
+        finished = time.time()
+        report = {
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+            "finished_at": datetime.fromtimestamp(finished).isoformat(timespec="seconds"),
+            "duration_seconds": round(finished - self.started_at, 3),
+            "counters": counters,
+            "histograms": histograms,
+        }
+        if extra:
+            report.update(extra)
+        return report
+
+    @staticmethod
+    def _write_atomic(path: str, text: str):
+        """寫入暫存檔後再改名，讀取端不會讀到寫到一半的內容"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def write_reports(self, date: str, extra: Optional[Dict] = None) -> Dict[str, str]:
+        """寫出 Prometheus textfile 與當次的 JSON 執行報告，回傳兩個檔案的路徑"""
+        report = self.report(dict(extra or {}, date=date))
+        report_path = os.path.join(
+            config.METRICS_REPORT_FOLDER, f"run_{date}_{datetime.now().strftime('%H%M%S')}.json"
+        )
+        self._write_atomic(report_path, json.dumps(report, ensure_ascii=False, indent=2, default=str))
+        self._write_atomic(config.METRICS_TEXTFILE, self.prometheus_text())
+        return {"prometheus": config.METRICS_TEXTFILE, "report": report_path}
+
+# 全域指標實例
+metrics = MetricsRegistry()
@@ -0,0 +1,118 @@
+from typing import Dict, Iterable, List, Optional
+import threading
+
+# 各時段依序經過的階段
+STAGES = ("download", "convert", "upload")
+
+
+def _slot_key(slot) -> tuple:
+    return tuple(int(value) for value in slot)
+
+
+class RunLedger:
+    """
+    本次執行的記憶體帳本：下載、轉換、上傳各階段完成時即時記錄
+
+    計數、失敗時段與各階段耗時在記錄時就累計好，查詢不需再掃描檔案；
+    時段「成功」的定義與原本的檔案檢查相同：已產生轉換後的 CSV
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.date = None
+        self._slots = []
+        self._expected = set()
+        self._converted = set()
+        self._success_count = 0
+        self._counts = {}
+        self._timings = {}
+
+    @property
+    def active(self) -> bool:
+        """本次執行是否已開始記錄"""
+        return self.date is not None
+
+    def begin(self, date: str, slots, converted: Iterable = ()):
+        """
+        開始記錄一次執行
+
+        Args:
+            date: 資料日期（YYYYMMDD）
+            slots: 本次執行的所有時段
+            converted: 上次執行已轉換完成的時段（重新執行時沿用）
+        """
+        with self._lock:
+            self.date = date
+            self._slots = [_slot_key(slot) for slot in slots]
+            self._expected = set(self._slots)
+            self._converted = {_slot_key(slot) for slot in converted} & self._expected
+            self._success_count = len(self._converted)
+            self._counts = {stage: {"done": 0, "failed": 0} for stage in STAGES}
+            self._timings = {stage: {"count": 0, "total": 0.0, "max": 0.0} for stage in STAGES}
+
+    def record(self, date: str, slot, stage: str, ok: bool = True, seconds: Optional[float] = None):
+        """記錄時段某個階段的結果與耗時（非本次執行日期的紀錄會被忽略）"""
+        if date != self.date:
+            return
+        key = _slot_key(slot)
+        with self._lock:
+            self._counts[stage]["done" if ok else "failed"] += 1
+            if seconds is not None:
+                timing = self._timings[stage]
+                timing["count"] += 1
+                timing["total"] += seconds
+                timing["max"] = max(timing["max"], seconds)
+
+            if stage == "convert":
+                if ok and key not in self._converted:
+                    self._converted.add(key)
+                    self._success_count += key in self._expected
+                elif not ok and key in self._converted:
+                    self._converted.discard(key)
+                    self._success_count -= key in self._expected
+
+    def succeeded(self, slot) -> bool:
+        """時段是否已產生轉換後的 CSV"""
+        return _slot_key(slot) in self._converted
+
+    @property
+    def total_count(self) -> int:
+        return len(self._slots)
+
+    @property
+    def success_count(self) -> int:
+        return self._success_count
+
+    @property
+    def fail_count(self) -> int:
+        return len(self._slots) - self._success_count
+
+    def failed_slots(self) -> List[tuple]:
+        """尚未產生 CSV 的時段（依時段順序）"""
+        return [slot for slot in self._slots if slot not in self._converted]
+
+    def stage_counts(self, stage: str) -> Dict:
+        """某個階段成功 / 失敗的次數"""
+        return dict(self._counts.get(stage, {"done": 0, "failed": 0}))
+
+    def timings(self) -> Dict:
+        """各階段的次數、總耗時、平均與最大耗時（秒）"""
+        with self._lock:
+            return {
+                stage: dict(timing, average=timing["total"] / timing["count"] if timing["count"] else 0.0)
+                for stage, timing in self._timings.items()
+            }
+
+    @property
+    def slots(self) -> List[tuple]:
+        """本次執行的所有時段"""
+        return list(self._slots)
+
+    def covers(self, date: str, slots=None) -> bool:
+        """帳本是否記錄了指定日期的這些時段（否則呼叫端需改為掃描資料夾）；slots 為 None 表示本次執行的時段"""
+        if not self.active or date != self.date:
+            return False
+        return slots is None or {_slot_key(slot) for slot in slots} == self._expected
+
+# 全域執行帳本實例
+run_ledger = RunLedger()
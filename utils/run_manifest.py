@@ -0,0 +1,184 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import config
+from utils.run_ledger import STAGES, run_ledger
+from utils.metrics import metrics
+
+# 轉換後 CSV 的檔名，用來由上傳的檔案反查日期與時段
+OUTPUT_FILE_PATTERN = re.compile(r"logger_urlLog_(\d{8})_(\d{2})(\d{2})-(\d{2})(\d{2})\.csv$")
+
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+
+def file_checksum(path: str) -> str:
+    """計算檔案的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHECKSUM_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def slot_key(slot) -> str:
+    """時段在清單中的鍵值，例如 (8, 0, 9) → "0800-0809" """
+    hour, start_min, end_min = slot
+    return f"{hour:02d}{start_min:02d}-{hour:02d}{end_min:02d}"
+
+
+class RunManifest:
+    """
+    執行清單：依日期記錄每個時段下載、轉換、上傳的狀態與檔案 checksum
+
+    清單存放在 config.MANIFEST_FOLDER（不在 temp 之內，不會被 clear_temp_folder 刪除），
+    重新執行時只需補做缺少或失敗的階段
+    """
+
+    def __init__(self, folder: Optional[str] = None):
+        self.folder = folder or config.MANIFEST_FOLDER
+        self.logger = logging.getLogger(__name__)
+        self._manifests = {}
+        self._lock = threading.Lock()
+
+    def _path(self, date: str) -> str:
+        return os.path.join(self.folder, f"manifest_{date}.json")
+
+    def _load(self, date: str) -> Dict:
+        """讀取指定日期的清單（呼叫端需持有鎖）"""
+        if date not in self._manifests:
+            manifest = {"date": date, "slots": None, "entries": {}}
+            path = self._path(date)
+            if os.path.exists(path):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        manifest = json.load(f)
+                except (OSError, ValueError) as e:
+                    self.logger.warning(f"⚠️ 執行清單讀取失敗，將重新建立: {e}")
+            self._manifests[date] = manifest
+        return self._manifests[date]
+
+    def _save(self, date: str):
+        """寫入暫存檔後再改名，中途中斷也不會留下損毀的清單（呼叫端需持有鎖）"""
+        os.makedirs(self.folder, exist_ok=True)
+        path = self._path(date)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifests[date], f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def planned_slots(self, date: str) -> Optional[List[tuple]]:
+        """上次執行規劃的時段；尚未執行過則回傳 None"""
+        with self._lock:
+            slots = self._load(date)["slots"]
+        return [tuple(slot) for slot in slots] if slots else None
+
+    def set_slots(self, date: str, slots):
+        """記錄本次執行規劃的時段，重新執行時沿用相同的切分"""
+        with self._lock:
+            self._load(date)["slots"] = [list(slot) for slot in slots]
+            self._save(date)
+
+    def mark(self, date: str, slot, stage: str, path: Optional[str] = None, ok: bool = True,
+             error: Optional[str] = None, seconds: Optional[float] = None):
+        """
+        記錄時段某個階段的結果；path 為該階段產出的檔案，會一併記錄 checksum
+
+        各階段完成時都會經過此處，因此同時更新本次執行的記憶體帳本（run_ledger）與執行指標（metrics）
+        """
+        record = {"status": "done" if ok else "failed", "at": datetime.now().isoformat(timespec="seconds")}
+        if path and os.path.exists(path):
+            record.update(file=path, size=os.path.getsize(path), sha256=file_checksum(path))
+        if error:
+            record["error"] = error
+        if seconds is not None:
+            record["seconds"] = round(seconds, 3)
+        run_ledger.record(date, slot, stage, ok, seconds)
+        metrics.inc("rpa_slots_total", stage=stage, result="success" if ok else "failed")
+        if seconds is not None:
+            metrics.observe("rpa_stage_seconds", seconds, stage=stage)
+        if ok and "size" in record:
+            metrics.inc("rpa_bytes_total", record["size"], stage=stage)
+
+        with self._lock:
+            entry = self._load(date)["entries"].setdefault(slot_key(slot), {})
+            entry[stage] = record
+            # 前一階段重做後，後續階段的結果不再有效
+            for later in STAGES[STAGES.index(stage) + 1:]:
+                entry.pop(later, None)
+            self._save(date)
+
+    def mark_uploaded(self, path: str, ok: bool = True, error: Optional[str] = None,
+                      seconds: Optional[float] = None):
+        """依轉換後的 CSV 檔名記錄上傳結果（檔名不符合格式時忽略）"""
+        match = OUTPUT_FILE_PATTERN.search(os.path.basename(path))
+        if not match:
+            return
+        date, hour, start_min, _, end_min = match.groups()
+        self.mark(date, (int(hour), int(start_min), int(end_min)), "upload", path, ok, error, seconds)
+
+    def is_uploaded(self, path: str) -> bool:
+        """CSV 是否已上傳，且檔案內容與上傳時相同"""
+        match = OUTPUT_FILE_PATTERN.search(os.path.basename(path))
+        if not match:
+            return False
+        date, hour, start_min, _, end_min = match.groups()
+        slot = (int(hour), int(start_min), int(end_min))
+        with self._lock:
+            record = dict(self._load(date)["entries"].get(slot_key(slot), {}).get("upload", {}))
+        if record.get("status") != "done" or not record.get("sha256"):
+            return False
+        return os.path.exists(path) and file_checksum(path) == record["sha256"]
+
+    def _valid(self, record: Optional[Dict]) -> bool:
+        """階段已完成，且產出的檔案（若有記錄）仍存在、checksum 相符"""
+        if not record or record.get("status") != "done":
+            return False
+        path = record.get("file")
+        if not path:
+            return True
+        return os.path.exists(path) and file_checksum(path) == record.get("sha256")
+
+    def pending_stage(self, date: str, slot) -> Optional[str]:
+        """
+        時段接下來要從哪個階段開始
+
+        Returns:
+            None: 已全部完成；"upload": CSV 已就緒；"convert": 原始檔已就緒；"download": 需重新下載
+        """
+        with self._lock:
+            entry = dict(self._load(date)["entries"].get(slot_key(slot), {}))
+
+        if entry.get("upload", {}).get("status") == "done":
+            return None
+        if self._valid(entry.get("convert")):
+            return "upload"
+        if self._valid(entry.get("download")):
+            return "convert"
+        return "download"
+
+    def pending(self, date: str, slots) -> Dict[str, List[tuple]]:
+        """依接下來的階段分組時段，例如 {"download": [...], "convert": [...], "upload": [...]}"""
+        groups = {stage: [] for stage in STAGES}
+        for slot in slots:
+            stage = self.pending_stage(date, slot)
+            if stage:
+                groups[stage].append(slot)
+        return groups
+
+    def stage_file(self, date: str, slot, stage: str) -> Optional[str]:
+        """取得時段某個階段產出的檔案路徑"""
+        with self._lock:
+            record = self._load(date)["entries"].get(slot_key(slot), {}).get(stage, {})
+        return record.get("file")
+
+    def is_complete(self, date: str, slots) -> bool:
+        """所有時段皆已上傳"""
+        return all(self.pending_stage(date, slot) is None for slot in slots)
+
+# 全域執行清單實例
+run_manifest = RunManifest()